@@ -1,2 +1,8 @@
 from .core import *
-from . import workflow
\ No newline at end of file
+from . import workflow
+from . import runner
+from . import export
+from . import aio
+from . import inventory
+from . import index
+from . import migration
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+----------
+ Examples
+----------
+
+Fetch all requests and download their input files over one event loop:
+----------------------------------------------------------------------
+
+.. code-block:: python
+
+    import asyncio
+    import inm_rspace as rs
+
+    async def main():
+      async with rs.aio.AsyncELN(concurrency=32) as eln:
+        requests = await rs.aio.get_requests(eln, rs.workflow.SHARED_FOLDER_ID)
+        files = [file for doc in requests for file in rs.get_files(doc, 'Input Data')]
+        paths = await rs.aio.download_files(eln, files, '/scratch/inputs')
+
+    asyncio.run(main())
+
+Like the blocking clients, `AsyncELN()` and `AsyncInventory()` connect with the
+environment variables `RSPACE_URL` and `RSPACE_API_KEY` by default.
+The asyncio clients require the optional dependency `aiohttp`.
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import os
+import asyncio
+from fnmatch import fnmatch
+
+
+
+class AsyncClient:
+  """Base class of the asyncio RSpace clients, which share one HTTP session
+  and limit the number of concurrent requests.
+
+  Parameters
+  ----------
+  url : str, optional
+      RSpace URL. Defaults to the environment variable `RSPACE_URL`.
+  key : str, optional
+      RSpace API key. Defaults to the environment variable `RSPACE_API_KEY`.
+  concurrency : int, optional
+      maximum number of concurrent requests
+  """
+  API_PATH = ''
+
+  def __init__(self, url=None, key=None, concurrency=16):
+    self.url = (url or os.getenv("RSPACE_URL") or '').rstrip('/')
+    self.key = key or os.getenv("RSPACE_API_KEY")
+    self.concurrency = concurrency
+    self._session = None
+    self._semaphore = None
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *args):
+    await self.close()
+
+  def _open(self):
+    if self._session is None:
+      try: import aiohttp
+      except ImportError:
+        raise ImportError("The asyncio clients require aiohttp. Install it with `pip install aiohttp`.")
+      self._session = aiohttp.ClientSession(headers={'apiKey': self.key})
+      self._semaphore = asyncio.Semaphore(self.concurrency)
+    return self._session
+
+  async def close(self):
+    """Close the HTTP session.
+    """
+    if self._session is not None: await self._session.close()
+    self._session = None
+
+  @staticmethod
+  def _numeric_id(global_id):
+    global_id = str(global_id)
+    return global_id[2:] if global_id[:2].isalpha() else global_id
+
+  async def request(self, method, endpoint, params=None, json=None, data=None):
+    """Make an API request.
+
+    Parameters
+    ----------
+    method : str
+        'GET', 'POST', 'PUT' or 'DELETE'
+    endpoint : str
+        API endpoint, e.g. '/documents/123'
+    params : dict, optional
+        query parameters
+    json : dict, optional
+        JSON request body
+    data : aiohttp.FormData, optional
+        multipart request body
+
+    Returns
+    -------
+    response : dict or str
+        parsed JSON response, or its text otherwise
+    """
+    session = self._open()
+    async with self._semaphore:
+      async with session.request(method, f"{self.url}{self.API_PATH}{endpoint}",
+                                 params=params, json=json, data=data) as response:
+        response.raise_for_status()
+        if 'application/json' in response.headers.get('Content-Type', ''):
+          return await response.json()
+        return await response.text()
+
+
+
+class AsyncELN(AsyncClient):
+  """asyncio counterpart of `core.ELNClass` for the most common requests.
+  """
+  API_PATH = '/api/v1'
+
+  async def get_document(self, doc_id):
+    return await self.request('GET', f"/documents/{self._numeric_id(doc_id)}")
+
+  async def update_document(self, document_id, name=None, tags=None, fields=None):
+    data = dict()
+    if name is not None: data['name'] = name
+    if tags is not None: data['tags'] = ','.join(tags) if isinstance(tags, list) else tags
+    if fields: data['fields'] = fields
+    return await self.request('PUT', f"/documents/{self._numeric_id(document_id)}", json=data)
+
+  async def get_folder(self, folder_id):
+    return await self.request('GET', f"/folders/{self._numeric_id(folder_id)}")
+
+  async def list_folder_tree(self, folder_id, page_number=0, page_size=100):
+    params = {'pageNumber': page_number, 'pageSize': page_size}
+    return await self.request('GET', f"/folders/tree/{self._numeric_id(folder_id)}", params=params)
+
+  async def get_form(self, form_id):
+    return await self.request('GET', f"/forms/{self._numeric_id(form_id)}")
+
+  async def get_file_info(self, file_id):
+    return await self.request('GET', f"/files/{self._numeric_id(file_id)}")
+
+  async def download_file(self, file_id, filepath, chunk_size=2**16):
+    """Download a gallery file to `filepath`.
+    """
+    session = self._open()
+    async with self._semaphore:
+      async with session.get(f"{self.url}{self.API_PATH}/files/{self._numeric_id(file_id)}/file") as response:
+        response.raise_for_status()
+        with open(filepath, 'wb') as fid:
+          async for chunk in response.content.iter_chunked(chunk_size):
+            fid.write(chunk)
+    return filepath
+
+  async def upload_file(self, filepath, folder_id=None, caption=None):
+    """Upload a local file to the gallery.
+    """
+    import aiohttp
+    with open(filepath, 'rb') as fid:
+      data = aiohttp.FormData()
+      data.add_field('file', fid, filename=os.path.basename(filepath))
+      if folder_id is not None: data.add_field('folderId', str(self._numeric_id(folder_id)))
+      if caption is not None: data.add_field('caption', caption)
+      return await self.request('POST', '/files', data=data)
+
+
+
+class AsyncInventory(AsyncClient):
+  """asyncio counterpart of `core.InventoryClass` for the most common requests.
+  """
+  API_PATH = '/api/inventory/v1'
+
+  async def get_sample_by_id(self, sample_id):
+    return await self.request('GET', f"/samples/{self._numeric_id(sample_id)}")
+
+  async def get_subsample_by_id(self, subsample_id):
+    return await self.request('GET', f"/subSamples/{self._numeric_id(subsample_id)}")
+
+  async def get_container_by_id(self, container_id):
+    return await self.request('GET', f"/containers/{self._numeric_id(container_id)}")
+
+  async def list_samples(self, page_number=0, page_size=100):
+    return await self.request('GET', '/samples', params={'pageNumber': page_number, 'pageSize': page_size})
+
+
+
+async def iter_folder_tree(eln, folder_id, page_size=100):
+  """asyncio version of `core.iter_folder_tree`.
+  """
+  page = 0
+  while True:
+    listing = await eln.list_folder_tree(folder_id, page_number=page, page_size=page_size)
+    for record in listing['records']: yield record
+    page += 1
+    if page*page_size >= listing.get('totalHits', 0) or not listing['records']: break
+
+async def get_docs_in_folder(eln, folder_id, form_pattern=None, recursive=False):
+  """asyncio version of `core.get_docs_in_folder`, which fetches all documents
+  concurrently.
+
+  Parameters
+  ----------
+  eln : AsyncELN
+      client
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  form_pattern : str, optional
+      glob-style pattern that the form name must match
+  recursive : bool, optional
+      if `True`, documents in subfolders are included as well
+
+  Returns
+  -------
+  results : list<dict>
+      list of documents matching the form name
+  """
+  tasks = []
+  async for record in iter_folder_tree(eln, folder_id):
+    if record['type'] == 'NOTEBOOK' or (recursive and record['type'] == 'FOLDER'):
+      tasks.append(get_docs_in_folder(eln, record['id'], form_pattern, recursive))
+    elif record['type'] == 'DOCUMENT':
+      tasks.append(eln.get_document(record['id']))
+
+  results = []
+  for result in await asyncio.gather(*tasks):
+    if isinstance(result, dict): result = [result]
+    results += [doc for doc in result if form_pattern is None or fnmatch(doc['form']['name'], form_pattern)]
+  return results
+
+async def get_requests(eln, shared_folder_id):
+  """asyncio version of `core.get_requests`.
+
+  Returns
+  -------
+  results : list<dict>
+      list of shared Rspace documents using a `Request:*` form
+  """
+  folders = [record async for record in iter_folder_tree(eln, shared_folder_id)]
+  results = await asyncio.gather(*[get_docs_in_folder(eln, folder['id'], 'Request:*') for folder in folders])
+  return [doc for docs in results for doc in docs]
+
+async def download_files(eln, files, directory):
+  """Download gallery files concurrently.
+
+  Parameters
+  ----------
+  eln : AsyncELN
+      client
+  files : list<dict>
+      Rspace file objects, e.g. from `core.get_files`
+  directory : str
+      local directory to download into
+
+  Returns
+  -------
+  paths : list<str>
+      local paths of the downloaded files
+  """
+  os.makedirs(directory, exist_ok=True)
+  return await asyncio.gather(*[eln.download_file(file['id'], f"{directory}{os.sep}{file['name']}") for file in files])
+
+async def upload_files(eln, paths, folder_id=None):
+  """Upload local files to the gallery concurrently.
+
+  Returns
+  -------
+  files : list<dict>
+      Rspace file objects of the uploaded files
+  """
+  return await asyncio.gather(*[eln.upload_file(path, folder_id=folder_id) for path in paths])
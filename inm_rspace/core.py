@@ -35,6 +35,33 @@ Create a new RSpace Form from a JSON metadata file:
 For more examples on managing JSON schemas and RSpace Forms, refer to `this script 
 <https://github.com/sintharic/inm-rspace/blob/main/examples/manage_forms.py>`_.
 
+Cache repeated read requests:
+-----------------------------
+
+.. code-block:: python
+
+    rs.ELN.enable_cache(ttl=60, maxsize=1024)
+    docs = rs.get_docs_in_notebook(7074)
+    docs = rs.get_docs_in_notebook(7074) # served from memory
+    print(rs.ELN.cache.stats())
+
+Changes made through the same client (e.g. `ELN.update_document`) remove the 
+affected responses from the cache.
+
+Spread requests over several API keys:
+--------------------------------------
+
+.. code-block:: python
+
+    clients = rs.ClientPool()
+    clients.add(url, alice_key, users=['alice'])
+    clients.add(url, service_key)
+    docs = rs.get_requests(SHARED_FOLDER_ID, client=clients.get())
+    workflows = [PlotColumnsCSV(doc, client=clients.for_document(doc)) for doc in docs]
+
+Each document is handled with the key of its owner if the pool has one, and 
+with the other keys in turn otherwise.
+
 -------------------
  API documentation
 -------------------
@@ -42,13 +69,212 @@ For more examples on managing JSON schemas and RSpace Forms, refer to `this scri
 """
 
 import os
+import re
+import copy
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
 from datetime import datetime
 from xml.dom.minidom import parseString as parse_xml
 from fnmatch import fnmatch
 from rspace_client.eln import eln
 from rspace_client.inv import inv
 
-class ELNClass(eln.ELNClient):
+
+
+class ResponseCache:
+  """In-memory cache of API responses with a time-to-live and 
+  least-recently-used eviction.
+
+  Parameters
+  ----------
+  ttl : float, optional
+      seconds after which a cached response expires
+  maxsize : int, optional
+      maximum number of cached responses
+  """
+  def __init__(self, ttl=60., maxsize=1024):
+    self.ttl = ttl
+    self.maxsize = maxsize
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key):
+    """Look up a response.
+    
+    Returns
+    -------
+    found : bool
+        True if a valid response was cached for `key`
+    value
+        a copy of the cached response, or None
+    """
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None or time.monotonic() > entry[0]:
+        if entry is not None: del self.entries[key]
+        self.misses += 1
+        return False, None
+      self.entries.move_to_end(key)
+      self.hits += 1
+      return True, copy.deepcopy(entry[1])
+
+  def put(self, key, value):
+    """Cache a response under `key`.
+    """
+    with self.lock:
+      self.entries[key] = (time.monotonic()+self.ttl, copy.deepcopy(value))
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.maxsize:
+        self.entries.popitem(last=False)
+
+  def invalidate(self, collections=None):
+    """Remove cached responses.
+    
+    Parameters
+    ----------
+    collections : list<str>, optional
+        API collections (e.g. 'documents') whose responses are removed.
+        If None, all responses are removed.
+    """
+    with self.lock:
+      if collections is None:
+        self.entries.clear()
+        return
+      for key in [key for key in self.entries if key[0].split('/')[1] in collections]:
+        del self.entries[key]
+
+  def stats(self):
+    """Hit and miss counters of the cache.
+    """
+    with self.lock:
+      return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+
+class ProgressLog:
+  """Append-only log of completed items of a bulk operation in JSON Lines
+  format, so that an interrupted operation can be resumed without repeating
+  completed items.
+
+  Parameters
+  ----------
+  path : str
+      log file, which is created if it does not exist
+  """
+  def __init__(self, path):
+    self.path = path
+    self.entries = dict()
+    self.lock = threading.Lock()
+    if os.path.isfile(path):
+      with open(path) as fid: lines = fid.read()
+      for line in lines.splitlines():
+        try: entry = json.loads(line)
+        except ValueError: continue # line truncated by an interruption
+        self.entries[entry['key']] = entry.get('value')
+      if lines and not lines.endswith('\n'):
+        with open(path, 'a') as fid: fid.write('\n')
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  def __len__(self):
+    return len(self.entries)
+
+  def get(self, key, default=None):
+    """Value recorded for a completed item, e.g. the globalId of a created object.
+    """
+    return self.entries.get(key, default)
+
+  def add(self, key, value=None):
+    """Record an item as completed.
+    """
+    with self.lock:
+      self.entries[key] = value
+      with open(self.path, 'a') as fid:
+        fid.write(json.dumps({'key': key, 'value': value}, default=str) + '\n')
+
+
+
+class _CachedClient:
+  """Mixin adding an optional `ResponseCache` to the read requests of an
+  RSpace client, which is invalidated by write requests of the same client.
+  """
+  cache = None
+  # read requests (relative to the API url) whose responses are cached
+  CACHED = re.compile(r'/(documents/\d+|folders/\d+|folders/tree(/\d+)?|forms(/\d+)?|files/\d+'
+                      r'|samples/\d+|subSamples/\d+|containers/\d+|instruments/\d+)')
+  # collections affected by writes to a collection; writes to others clear the whole cache
+  INVALIDATES = {
+    'documents': ('documents', 'folders'), 
+    'folders': ('folders', 'documents'), 
+    'forms': ('forms',), 
+    'files': ('files',),
+  }
+
+  def enable_cache(self, ttl=60., maxsize=1024):
+    """Cache the responses of read requests (documents, folders, forms, files
+    and Inventory items) in memory.
+    
+    Parameters
+    ----------
+    ttl : float, optional
+        seconds after which a cached response expires
+    maxsize : int, optional
+        maximum number of cached responses
+    """
+    self.cache = ResponseCache(ttl, maxsize)
+
+  def disable_cache(self):
+    """Stop caching responses.
+    """
+    self.cache = None
+
+  def _cache_path(self, endpoint):
+    url = self._get_api_url()
+    if endpoint.startswith(url): endpoint = endpoint[len(url):]
+    return endpoint
+
+  def _invalidate(self, path):
+    collection = path.split('/')[1] if path.startswith('/') else None
+    self.cache.invalidate(self.INVALIDATES.get(collection))
+
+  def retrieve_api_results(self, endpoint, params=None, content_type="application/json", request_type="GET"):
+    if self.cache is None:
+      return super().retrieve_api_results(endpoint, params, content_type, request_type)
+
+    path = self._cache_path(endpoint)
+    if request_type == 'GET' and content_type == 'application/json' and self.CACHED.fullmatch(path):
+      key = (path, json.dumps(params, sort_keys=True, default=str))
+      found, value = self.cache.get(key)
+      if found: return value
+      value = super().retrieve_api_results(endpoint, params, content_type, request_type)
+      if isinstance(value, (dict, list)): self.cache.put(key, value)
+      return value
+
+    result = super().retrieve_api_results(endpoint, params, content_type, request_type)
+    if request_type != 'GET': self._invalidate(path)
+    return result
+
+  def _post_multipart(self, endpoint, files=None, data=None):
+    result = super()._post_multipart(endpoint, files=files, data=data)
+    if self.cache is not None: self._invalidate(self._cache_path(endpoint))
+    return result
+
+  def __getstate__(self):
+    # the cache is not shared with copies in other processes
+    state = self.__dict__.copy()
+    state.pop('cache', None)
+    return state
+
+
+
+class ELNClass(_CachedClient, eln.ELNClient):
   """ELN class enhancing the rspace_client.eln.ELNClient class
   """
   
@@ -58,8 +284,9 @@ class ELNClass(eln.ELNClient):
   def connect(self, url, key):
     # self = eln.ELNClient(url, key)
     eln.ELNClient.__init__(self, url, key)
+    if self.cache is not None: self.cache.invalidate()
 
-class InventoryClass(inv.InventoryClient):
+class InventoryClass(_CachedClient, inv.InventoryClient):
   """Inventory class enhancing the rspace_client.inv.InventoryClient class
   """
   def __init__(self):
@@ -67,6 +294,7 @@ class InventoryClass(inv.InventoryClient):
 
   def connect(self, url, key):
     inv.InventoryClient.__init__(self, url, key)
+    if self.cache is not None: self.cache.invalidate()
 
 
 ELN = ELNClass()
@@ -78,7 +306,109 @@ try:
 except:
   pass
 
+
+
+class ClientPool:
+  """Pool of connected `ELNClass` clients for several API keys (e.g. one per
+  user or several service keys) and RSpace servers.
+
+  Documents are routed to the client of their owner. Requests that belong to
+  no particular user are distributed over the shared clients of a server in 
+  turn, so that the request rate is spread over their API keys.
+
+  Parameters
+  ----------
+  fallback : ELNClass, optional
+      client used if no client in the pool matches. Defaults to `ELN`.
+  """
+  def __init__(self, fallback=None):
+    self.clients = dict()
+    self.users = dict()
+    self.shared = set()
+    self.fallback = fallback if fallback is not None else ELN
+    self.lock = threading.Lock()
+    self._turn = 0
+
+  def __len__(self):
+    return len(self.clients)
+
+  def add(self, url, key, users=(), cache=None, shared=None):
+    """Connect a new client and add it to the pool.
+
+    Parameters
+    ----------
+    url : str
+        RSpace server URL
+    key : str
+        RSpace API key
+    users : list<str>, optional
+        usernames whose documents are handled by this client
+    cache : dict, optional
+        keyword arguments of `enable_cache`, if the client caches responses
+    shared : bool, optional
+        if `True`, the client also handles requests of other users in turn
+        with the other shared clients. Defaults to `True` if no `users` are
+        given and to `False` otherwise.
+
+    Returns
+    -------
+    client : ELNClass
+        the connected client
+    """
+    client = ELNClass()
+    client.connect(url, key)
+    if cache is not None: client.enable_cache(**cache)
+    url = client.rspace_url
+    with self.lock:
+      self.clients[(url, key)] = client
+      for user in users: self.users[(url, user)] = client
+      if shared if shared is not None else not users: self.shared.add((url, key))
+      else: self.shared.discard((url, key))
+    return client
+
+  def get(self, url=None, user=None):
+    """Client for a server and user.
+
+    Parameters
+    ----------
+    url : str, optional
+        RSpace server URL. If None, clients of all servers are considered.
+    user : str, optional
+        username. If None or unknown, the next shared client of the server 
+        in turn is returned.
+
+    Returns
+    -------
+    client : ELNClass
+        the matching client, or `self.fallback` if the pool has none
+    """
+    if url is not None: url = url.rstrip('/')
+    with self.lock:
+      if user is not None:
+        for (client_url, client_user), client in self.users.items():
+          if client_user == user and url in (None, client_url): return client
+      clients = [client for (client_url, key), client in self.clients.items() 
+                 if (client_url, key) in self.shared and url in (None, client_url)]
+      if not clients: return self.fallback
+      self._turn += 1
+      return clients[self._turn % len(clients)]
+
+  def for_document(self, document):
+    """Client for an RSpace document, chosen by the server it was fetched
+    from and the username of its owner.
+    """
+    url = None
+    links = document.get('_links') or []
+    if links: url = links[0]['link'].split('/api/')[0]
+    user = (document.get('owner') or {}).get('username')
+    return self.get(url=url, user=user)
+
 replace = {' ': '_', ',': '.', '<p>': '', '</p>': ''}
+# links to RSpace objects in field content: html_ref-style tags, links by globalId, 
+# and attachments or images by their numeric gallery file id
+LINK_PATTERN = re.compile(r'<(docId|fileId)=(\d+)>'
+                          r'|(?:/globalId/|data-globalid=["\'])([A-Z]{2}\d+)'
+                          r'|(?:/Streamfile/|sourceId=|attachOnText_)(\d+)')
 
 
 
@@ -120,6 +450,132 @@ def get_line(string, index):
 
 
 
+def linked_ids(content):
+  """find the globalIds of all RSpace objects linked in an html string,
+  such as the content of a document field.
+  
+  Parameters
+  ----------
+  content : str
+      html string
+  
+  Returns
+  -------
+  ids : list<str>
+      globalIds in order of their first appearance
+  """
+  ids = dict()
+  for match in LINK_PATTERN.finditer(content or ''):
+    tag, tag_id, global_id, file_id = match.groups()
+    if tag is not None: global_id = ('SD' if tag=='docId' else 'GL') + tag_id
+    elif file_id is not None: global_id = 'GL' + file_id
+    ids[global_id] = None
+  return list(ids)
+
+def document_links(document):
+  """find the globalIds of all RSpace objects linked in or attached to the 
+  fields of an Rspace document.
+  
+  Parameters
+  ----------
+  document : dict
+      input document
+  
+  Returns
+  -------
+  ids : list<str>
+      globalIds in order of their first appearance
+  """
+  ids = dict()
+  for field in document['fields']:
+    for global_id in linked_ids(field.get('content') if isinstance(field.get('content'), str) else ''):
+      ids[global_id] = None
+    for file in field.get('files') or []:
+      ids[file['globalId']] = None
+  ids.pop(document.get('globalId'), None)
+  return list(ids)
+
+def link_graph(documents):
+  """map each of a number of Rspace documents to the RSpace objects it links to.
+  
+  Parameters
+  ----------
+  documents : iterable<dict>
+      input documents (can be a generator)
+  
+  Returns
+  -------
+  graph : dict
+      globalIds of linked objects by the globalId of each document
+  """
+  return {document['globalId']: document_links(document) for document in documents}
+
+def get_object(global_id, client=None, inventory=None):
+  """get any RSpace ELN or Inventory object by its globalId.
+  
+  Parameters
+  ----------
+  global_id : str
+      globalId, whose prefix determines the object type 
+      (e.g. 'SD' for documents or 'GL' for gallery files)
+  client : ELNClass, optional
+      client used for ELN objects. Defaults to `ELN`.
+  inventory : InventoryClass, optional
+      client used for Inventory objects. Defaults to `Inventory`.
+  
+  Returns
+  -------
+  obj : dict
+      the RSpace object
+  
+  Raises
+  ------
+  ValueError
+      raised if the globalId prefix is not recognized
+  """
+  if client is None: client = ELN
+  if inventory is None: inventory = Inventory
+  getters = {
+    'SD': client.get_document, 'GL': client.get_file_info, 'NB': client.get_folder, 'FL': client.get_folder, 
+    'FM': client.get_form, 'SA': inventory.get_sample_by_id, 'SS': inventory.get_subsample_by_id, 
+    'IC': inventory.get_container_by_id, 'IT': inventory.get_instrument_by_id,
+  }
+  prefix = global_id[:2]
+  if prefix not in getters: raise ValueError(f'Unknown rspace object type: {global_id}')
+  return getters[prefix](global_id)
+
+def prefetch_objects(global_ids, max_workers=8, client=None, inventory=None):
+  """get many RSpace objects by their globalIds concurrently.
+  
+  Parameters
+  ----------
+  global_ids : iterable<str>
+      globalIds, e.g. from `document_links` or `link_graph`.
+      Duplicates are only fetched once.
+  max_workers : int, optional
+      maximum number of concurrent requests
+  client, inventory : optional
+      clients used for the requests (see `get_object`)
+  
+  Returns
+  -------
+  objects : dict
+      RSpace objects by globalId. Objects that could not be fetched are 
+      missing and a warning is printed.
+  """
+  global_ids = list(dict.fromkeys(global_ids))
+  def fetch(global_id):
+    try: return get_object(global_id, client=client, inventory=inventory)
+    except Exception as error:
+      print(f"WARNING: could not fetch {global_id}: {error}")
+      return None
+
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    objects = dict(zip(global_ids, pool.map(fetch, global_ids)))
+  return {global_id: obj for global_id, obj in objects.items() if obj is not None}
+
+
+
 def tables_from_xml(xml_string, file, delimiter=',', replace=replace):
   """
   extract all tabular data from an xml string and save it as a csv file.
@@ -226,7 +682,7 @@ def get_files(document, field_key=None):
   
   return document['fields'][field_key]['files']
   
-def get_docs_in_notebook(notebook_id, form_pattern=None, verbose=False):
+def get_docs_in_notebook(notebook_id, form_pattern=None, verbose=False, client=None):
   """
   scan for Rspace documents in a given folder whose form name matches a pattern
   
@@ -236,6 +692,8 @@ def get_docs_in_notebook(notebook_id, form_pattern=None, verbose=False):
       notebookID of the Rspace notebook to search for matches
   form_pattern : str
       glob-style pattern that the form name must match
+  client : ELNClass, optional
+      client used for the requests. Defaults to `ELN`.
 
   Returns
   -------
@@ -243,11 +701,12 @@ def get_docs_in_notebook(notebook_id, form_pattern=None, verbose=False):
       list of documents matching the form name
   """
 
+  if client is None: client = ELN
   results = []
-  records = ELN.list_folder_tree(notebook_id)
-  nb_name = ELN.get_folder(notebook_id)['name']
+  records = client.list_folder_tree(notebook_id)
+  nb_name = client.get_folder(notebook_id)['name']
   for page in records['records']:
-    doc = ELN.get_document(page['id'])
+    doc = client.get_document(page['id'])
     print(f"- {nb_name}/{doc['name']} ({doc['form']['name']})")
     if form_pattern is None: 
       results.append(doc)
@@ -257,7 +716,7 @@ def get_docs_in_notebook(notebook_id, form_pattern=None, verbose=False):
 
   return results
 
-def get_docs_in_folder(folder_id, form_pattern=None, verbose=False):
+def get_docs_in_folder(folder_id, form_pattern=None, verbose=False, client=None):
   """
   scan for Rspace documents in a given folder whose form name matches a pattern
   
@@ -267,20 +726,23 @@ def get_docs_in_folder(folder_id, form_pattern=None, verbose=False):
       folderID of the Rspace folder to search for matches
   form_pattern : str
       glob-style pattern that the form name must match
+  client : ELNClass, optional
+      client used for the requests. Defaults to `ELN`.
 
   Returns
   -------
   results : list<dict>
       list of documents matching the form name
   """
-  records = ELN.list_folder_tree(folder_id)
+  if client is None: client = ELN
+  records = client.list_folder_tree(folder_id)
   results = []
   for share in records['records']:
     if share['type']=='NOTEBOOK':
-      results += get_docs_in_notebook(share['id'], form_pattern=form_pattern, verbose=verbose)
+      results += get_docs_in_notebook(share['id'], form_pattern=form_pattern, verbose=verbose, client=client)
       continue
     
-    doc = ELN.get_document(share['id'])
+    doc = client.get_document(share['id'])
     if verbose: print(f"- {doc['name']} ({doc['form']['name']})")
     if form_pattern is None: 
       results.append(doc)
@@ -290,26 +752,89 @@ def get_docs_in_folder(folder_id, form_pattern=None, verbose=False):
 
   return results
 
+def iter_folder_tree(folder_id, page_size=100, client=None):
+  """
+  iterate over all records (documents, notebooks and folders) directly in an 
+  Rspace folder or notebook, requesting one page of the listing at a time.
+  
+  Parameters
+  ----------
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  page_size : int, optional
+      number of records per request
+  client : ELNClass, optional
+      client used for the requests. Defaults to `ELN`.
+
+  Yields
+  ------
+  record : dict
+      folder tree record with keys such as 'id', 'globalId', 'name', 'type'
+      and 'lastModified'
+  """
+  if client is None: client = ELN
+  page = 0
+  while True:
+    listing = client.retrieve_api_results(f"/folders/tree/{folder_id}", params={'pageNumber': page, 'pageSize': page_size})
+    yield from listing['records']
+    page += 1
+    if page*page_size >= listing.get('totalHits', 0) or not listing['records']: break
 
+def iter_docs_in_folder(folder_id, form_pattern=None, recursive=False, client=None):
+  """
+  iterate over the Rspace documents in a given folder or notebook whose form
+  name matches a pattern, fetching one document at a time.
+  Documents in notebooks are included, as in `get_docs_in_folder`.
+  
+  Parameters
+  ----------
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  form_pattern : str, optional
+      glob-style pattern that the form name must match
+  recursive : bool, optional
+      if `True`, documents in subfolders are included as well
+  client : ELNClass, optional
+      client used for the requests. Defaults to `ELN`.
 
-def get_requests(shared_folder_id, verbose=False):
+  Yields
+  ------
+  document : dict
+      the next document matching the form name
+  """
+  if client is None: client = ELN
+  for record in iter_folder_tree(folder_id, client=client):
+    if record['type'] == 'NOTEBOOK' or (recursive and record['type'] == 'FOLDER'):
+      yield from iter_docs_in_folder(record['id'], form_pattern=form_pattern, recursive=recursive, client=client)
+      continue
+    if record['type'] != 'DOCUMENT': continue
+
+    doc = client.get_document(record['id'])
+    if form_pattern is None or fnmatch(doc['form']['name'], form_pattern): yield doc
+
+
+
+def get_requests(shared_folder_id, verbose=False, client=None):
   """get all shared documents requesting a workflow to be performed
   
   Parameters
   ----------
   shared_folder_id : str
       folderId of the "Shared" Folder in Rspace
+  client : ELNClass, optional
+      client used for the requests. Defaults to `ELN`.
   
   Returns
   -------
   results : list<dict>
       list of shared Rspace documents using a `Request:*` form
   """
-  user_folders = ELN.list_folder_tree(shared_folder_id)
+  if client is None: client = ELN
+  user_folders = client.list_folder_tree(shared_folder_id)
   results = []
   for folder in user_folders['records']:
     if verbose: print(f"{folder['name']} ({folder['id']}):")
-    results += get_docs_in_folder(folder['id'], 'Request:*', verbose=verbose)
+    results += get_docs_in_folder(folder['id'], 'Request:*', verbose=verbose, client=client)
     if verbose: print()
 
   return results
@@ -354,6 +879,46 @@ def field_index(document, field_name):
     if field['name']==field_name: return idx
   return -1
 
+def field_snapshot(document):
+  """record the content of all fields of an Rspace document dict.
+  
+  Parameters
+  ----------
+  document : dict
+      input document
+  
+  Returns
+  -------
+  snapshot : list<str>
+      content of each field, in the order of the document's fields
+  """
+  return [field.get('content') for field in document['fields']]
+
+def changed_fields(document, snapshot):
+  """get the fields of an Rspace document dict whose content differs from
+  a snapshot taken by `field_snapshot`.
+  
+  Parameters
+  ----------
+  document : dict
+      input document
+  snapshot : list<str>
+      previous content of each field
+  
+  Returns
+  -------
+  fields : list<dict>
+      changed fields as {'id': ..., 'content': ...} dicts, which can be passed
+      to `ELN.update_document` to update only these fields. If any field has 
+      no id, all fields are returned instead.
+  """
+  fields = document['fields']
+  changed = [field for field, content in zip(fields, snapshot) if field.get('content') != content]
+  if len(fields) != len(snapshot): changed = list(fields)
+  if not changed: return []
+  if any('id' not in field for field in changed): return fields
+  return [{'id': field['id'], 'content': field['content']} for field in changed]
+
 
 
 def fields_are_compatible(fields1, fields2, subset=False):
@@ -523,8 +1088,140 @@ def form_fields_from_json(json_dict:dict, default:bool=False):
     return result
 
 
+class SchemaInference:
+    """Incrementally infer RSpace Form fields from many JSON-style dicts, 
+    such as a whole dataset of metadata files, in the same way as 
+    `form_fields_from_json` does for a single dict.
+
+    Only a summary of the values observed for each key is kept in memory:
 
-def get_form_by_dict(new_form, subset=False):
+- integer and float values are merged into 'Number' fields with the maximum 
+  number of decimal places
+- options of list values are merged into the options of a 'Choice' field
+- strings are 'Date' fields only if all of them are ISO dates
+- keys with conflicting types become 'String' or 'Text' fields, keys with
+  list values in some dicts and other values in others become 'Text' fields
+
+    Parameters
+    ----------
+    max_options : int
+        maximum number of options of a 'Choice' field. Keys with more 
+        different options become 'Text' fields.
+    """
+    def __init__(self, max_options=100):
+        self.max_options = max_options
+        self.keys = OrderedDict()
+        self.count = 0
+
+    @staticmethod
+    def _kind(value):
+        if isinstance(value, (list, tuple, set)): return 'Choice'
+        if isinstance(value, bool): return 'Radio'
+        if isinstance(value, int): return 'Integer'
+        if isinstance(value, float): return 'Float'
+        if isinstance(value, datetime): return 'Date'
+        if isinstance(value, str):
+            try: 
+                datetime.fromisoformat(value)
+                return 'Date'
+            except ValueError:
+                return 'String'
+        return 'Text'
+
+    def add(self, json_dict:dict):
+        """Add the key,value pairs of a JSON-style dict to the observations.
+        """
+        self.count += 1
+        for key, value in json_dict.items():
+            stats = self.keys.setdefault(key, {'kinds': set(), 'options': dict(), 'decimals': 0})
+            if value is None: continue
+            kind = self._kind(value)
+            if kind == 'Choice' and not len(value): continue
+            stats['kinds'].add(kind)
+
+            if kind == 'Float':
+                exponent = Decimal(repr(value)).as_tuple().exponent
+                if isinstance(exponent, int): 
+                    stats['decimals'] = max(stats['decimals'], -exponent)
+            elif kind == 'Choice' and stats['options'] is not None:
+                for element in value: stats['options'][str(element)] = None
+                if len(stats['options']) > self.max_options: stats['options'] = None
+
+    def add_files(self, paths):
+        """Add the contents of JSON files (a dict or a list of dicts per file) 
+        or JSON Lines files (one dict per line, extension `.jsonl`) to the 
+        observations, reading one file or line at a time.
+
+        Parameters
+        ----------
+        paths : iterable<str>
+            file paths
+        """
+        for path in paths:
+            with open(path) as fid:
+                if path.endswith('.jsonl'):
+                    for line in fid:
+                        if line.strip(): self.add(json.loads(line))
+                    continue
+                content = json.load(fid)
+            if isinstance(content, dict): content = [content]
+            for json_dict in content: self.add(json_dict)
+
+    def form_fields(self):
+        """Form fields fitting all observed dicts.
+
+        Returns
+        -------
+        list<dict>
+            RSpace Form field list of {'name': ..., 'type': ..., (...)} dicts.
+        """
+        result = []
+        for key, stats in self.keys.items():
+            kinds = stats['kinds']
+            field = {'name': key}
+            if not kinds or 'Text' in kinds:
+                field['type'] = 'Text'
+            elif kinds <= {'Integer', 'Float'}:
+                field['type'] = 'Number'
+                field['decimalPlaces'] = stats['decimals']
+            elif kinds == {'Radio'}:
+                field['type'] = 'Radio'
+                field['options'] = ['yes', 'no']
+            elif kinds == {'Date'}:
+                field['type'] = 'Date'
+            elif kinds == {'Choice'}:
+                if stats['options'] is None:
+                    field['type'] = 'Text'
+                else:
+                    field['type'] = 'Choice'
+                    field['options'] = list(stats['options'])
+            elif 'Choice' in kinds:
+                # the options would miss the values of the other kinds
+                field['type'] = 'Text'
+            else:
+                field['type'] = 'String'
+            result.append(field)
+        return result
+
+    def form(self, name):
+        """Form definition fitting all observed dicts, which can be passed to
+        `get_form_by_dict`.
+
+        Parameters
+        ----------
+        name : str
+            name of the Form
+
+        Returns
+        -------
+        dict
+            Form definition with the keys 'name' and 'fields'.
+        """
+        return {'name': name, 'fields': self.form_fields()}
+
+
+
+def get_form_by_dict(new_form, subset=False, client=None):
     """If it exists, return the (first) Rspace Form matching a given 
     RSpace Form definition dict. Otherwise, create this Form and return it.
     
@@ -537,22 +1234,26 @@ def get_form_by_dict(new_form, subset=False):
     subset : bool
         if `True`, the function only checks whether the fields of <new_form> 
         are a subset of the fields in an existing RSpace Form.
+
+    client : ELNClass, optional
+        client used for the requests. Defaults to `ELN`.
     
     Returns
     -------
     rs_form : dict
         the found/newly created RSpace form. 
     """
-    forms = ELN.get_forms()['forms']
+    if client is None: client = ELN
+    forms = client.get_forms()['forms']
     found_form = False
     for form in forms:
-        form = ELN.get_form(form['id'])
+        form = client.get_form(form['id'])
         if forms_are_compatible(new_form, form, subset=subset):
             return form
     
-    rs_form = ELN.create_form(new_form['name'], fields=new_form['fields'])
+    rs_form = client.create_form(new_form['name'], fields=new_form['fields'])
     print(f"No matching Form found. Publishing new Form: {rs_form['globalId']}")
-    ELN.publish_form(rs_form['globalId'])
+    client.publish_form(rs_form['globalId'])
 
     return rs_form
 
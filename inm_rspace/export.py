@@ -0,0 +1,444 @@
+"""
+----------
+ Examples
+----------
+
+Export all documents of a Form in a folder to a Parquet file:
+-------------------------------------------------------------
+
+.. code-block:: python
+
+    import inm_rspace as rs
+    import pandas as pd
+
+    rows = rs.export.export_documents(7074, 'uv-vis.parquet', form_pattern='UV-vis*')
+    data = pd.read_parquet('uv-vis.parquet')
+
+Documents are fetched and written in row groups one after another, so the
+memory needed does not grow with the number of documents.
+The columnar export requires the optional dependency `pyarrow`.
+
+Mirror a notebook with all attachments to a local directory:
+------------------------------------------------------------
+
+.. code-block:: python
+
+    summary = rs.export.mirror_folder(7074, '/scratch/rspace_mirror')
+
+Running it again only transfers documents modified since the last run and 
+attachments whose size or version changed.
+
+Extract all tables embedded in the documents of a notebook:
+-----------------------------------------------------------
+
+.. code-block:: python
+
+    manifest = rs.export.extract_tables(7074, '/scratch/uv-vis_tables', processes=8)
+    print(sum(table['rows'] for table in manifest['tables']))
+
+Every table becomes a csv file named by the document globalId and the field
+name, as produced by `core.tables_from_xml`.
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import os
+import re
+import json
+import itertools
+import traceback
+from datetime import datetime
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from . import core
+
+
+
+# metadata columns preceding the document fields
+DOCUMENT_COLUMNS = ('globalId', 'name', 'created', 'lastModified')
+# prefix of the document columns, so that they do not collide with field names
+COLUMN_PREFIX = '_'
+
+
+
+def _pyarrow():
+  try: import pyarrow
+  except ImportError:
+    raise ImportError("Columnar export requires pyarrow. Install it with `pip install pyarrow`.")
+  return pyarrow
+
+def column_type(field_type, dictionary=True):
+  """Arrow data type of a column holding RSpace fields of a given type.
+
+  Parameters
+  ----------
+  field_type : str
+      RSpace field type, e.g. 'Number', 'Date' or 'Choice' (case-insensitive)
+  dictionary : bool, optional
+      if `False`, choice and radio fields are stored as plain strings
+
+  Returns
+  -------
+  dtype : pyarrow.DataType
+      float64 for numbers, date32 for dates, dictionary-encoded strings for
+      choice and radio fields and strings otherwise.
+  """
+  pa = _pyarrow()
+  field_type = field_type.lower()
+  if field_type == 'number': return pa.float64()
+  if field_type == 'date': return pa.date32()
+  if field_type in ('choice', 'radio') and dictionary: return pa.dictionary(pa.int32(), pa.string())
+  return pa.string()
+
+def column_value(content, field_type):
+  """Convert the content of an RSpace field to the value stored in its column.
+  Empty or unparsable content is stored as null.
+  """
+  if content is None or content == '': return None
+  field_type = field_type.lower()
+  if field_type == 'number':
+    try: return float(content)
+    except (TypeError, ValueError): return None
+  if field_type == 'date':
+    try: return datetime.strptime(str(content)[:10], '%Y-%m-%d').date()
+    except ValueError: return None
+  return str(content)
+
+def form_schema(fields, dictionary=True):
+  """Arrow schema for documents with the given fields.
+
+  Parameters
+  ----------
+  fields : list<dict>
+      RSpace Form or document fields containing at least the keys 'name' and 'type'
+  dictionary : bool, optional
+      see `column_type`
+
+  Returns
+  -------
+  schema : pyarrow.Schema
+      schema with the columns `DOCUMENT_COLUMNS` (prefixed by `COLUMN_PREFIX`,
+      e.g. '_globalId') followed by one column per field
+  """
+  pa = _pyarrow()
+  columns = [pa.field(COLUMN_PREFIX+name, pa.string()) for name in DOCUMENT_COLUMNS]
+  columns += [pa.field(field['name'], column_type(field['type'], dictionary)) for field in fields]
+  return pa.schema(columns)
+
+def iter_record_batches(documents, fields, batch_size=1000, dictionary=True):
+  """Convert a stream of documents into Arrow record batches.
+
+  Parameters
+  ----------
+  documents : iterable<dict>
+      RSpace documents (can be a generator)
+  fields : list<dict>
+      fields defining the columns (see `form_schema`). Document fields are
+      matched by name; missing fields are stored as null.
+  batch_size : int, optional
+      number of documents per record batch
+  dictionary : bool, optional
+      see `column_type`. Dictionary-encoded columns get a separate dictionary
+      in every batch.
+
+  Yields
+  ------
+  batch : pyarrow.RecordBatch
+      the next `batch_size` documents
+  """
+  pa = _pyarrow()
+  schema = form_schema(fields, dictionary)
+  types = {field['name']: field['type'] for field in fields}
+  columns = {name: [] for name in schema.names}
+
+  def flush():
+    batch = pa.RecordBatch.from_pydict(columns, schema=schema)
+    for values in columns.values(): values.clear()
+    return batch
+
+  for document in documents:
+    for name in DOCUMENT_COLUMNS: columns[COLUMN_PREFIX+name].append(document.get(name))
+    contents = {field['name']: field.get('content') for field in document['fields']}
+    for name, field_type in types.items():
+      columns[name].append(column_value(contents.get(name), field_type))
+    if len(columns[COLUMN_PREFIX+'globalId']) >= batch_size: yield flush()
+  if columns[COLUMN_PREFIX+'globalId']: yield flush()
+
+def export_documents(folder_id, path, form_id=None, form_pattern=None, file_format='parquet',
+                     batch_size=1000, recursive=True):
+  """Stream the documents in an RSpace folder or notebook into a columnar
+  Parquet or Arrow file with one column per Form field.
+
+  Parameters
+  ----------
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  path : str
+      output file path
+  form_id : str, optional
+      id or globalId of the Form defining the columns. Only documents using 
+      this Form are exported. By default, the fields of the first matching 
+      document are used.
+  form_pattern : str, optional
+      glob-style pattern that the form name of documents must match
+  file_format : str, optional
+      'parquet' or 'arrow' (Arrow IPC file, in which choice and radio fields
+      are stored as plain strings, since it allows only one dictionary per column)
+  batch_size : int, optional
+      number of documents per row group
+  recursive : bool, optional
+      if `True`, documents in subfolders are included as well
+
+  Returns
+  -------
+  rows : int
+      number of exported documents
+  """
+  pa = _pyarrow()
+  documents = core.iter_docs_in_folder(folder_id, form_pattern=form_pattern, recursive=recursive)
+  if form_id is not None:
+    form = core.ELN.get_form(form_id)
+    fields = form['fields']
+    documents = (document for document in documents if str(document['form']['id']) == str(form['id']))
+  else:
+    first = next(documents, None)
+    if first is None: return 0
+    fields = first['fields']
+    documents = itertools.chain([first], documents)
+
+  dictionary = file_format != 'arrow'
+  schema = form_schema(fields, dictionary)
+  if file_format == 'parquet':
+    import pyarrow.parquet as pq
+    writer = pq.ParquetWriter(path, schema)
+  elif file_format == 'arrow':
+    writer = pa.ipc.new_file(path, schema)
+  else:
+    raise ValueError(f"Unknown file format: {file_format}")
+
+  rows = 0
+  with writer:
+    for batch in iter_record_batches(documents, fields, batch_size=batch_size, dictionary=dictionary):
+      writer.write_table(pa.Table.from_batches([batch]))
+      rows += batch.num_rows
+  return rows
+
+
+
+def _safe_name(name):
+  return re.sub(r'[\\/:*?"<>|]', '_', str(name))
+
+def mirror_folder(folder_id, directory, max_workers=8, delete=False):
+  """Mirror an RSpace folder or notebook tree with all documents and their 
+  attached files to a local directory.
+
+  Every folder, notebook and document becomes a directory named 
+  `<globalId>_<name>`. A document directory contains the document as 
+  `document.json` and its attached files. A manifest `.mirror.json` in 
+  `directory` records what has been transferred, so that subsequent runs 
+  only fetch documents whose modification time changed and download files 
+  whose size or version changed.
+
+  Parameters
+  ----------
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  directory : str
+      local directory to mirror into
+  max_workers : int, optional
+      maximum number of concurrent requests
+  delete : bool, optional
+      if `True`, local documents and files that no longer exist in the 
+      folder tree are deleted.
+
+  Returns
+  -------
+  summary : dict
+      numbers of fetched, unchanged and deleted documents and of downloaded 
+      files, and errors by globalId of the documents or files that could not 
+      be transferred ('errors'). These are retried on the next run.
+  """
+  os.makedirs(directory, exist_ok=True)
+  manifest_path = f"{directory}{os.sep}.mirror.json"
+  try:
+    with open(manifest_path) as fid: manifest = json.load(fid)
+  except (OSError, ValueError):
+    manifest = {'documents': dict(), 'files': dict()}
+
+  # walk the folder tree and collect the documents to be fetched
+  changed, seen = [], set()
+  def walk(folder, path):
+    for record in core.iter_folder_tree(folder):
+      record_path = f"{path}{os.sep}{record['globalId']}_{_safe_name(record['name'])}"
+      if record['type'] in ('FOLDER', 'NOTEBOOK'):
+        walk(record['id'], record_path)
+        continue
+      if record['type'] != 'DOCUMENT': continue
+      seen.add(record['globalId'])
+      known = manifest['documents'].get(record['globalId'])
+      if known is not None and known['lastModified'] == record.get('lastModified') \
+        and known['path'] == record_path and os.path.isfile(f"{record_path}{os.sep}document.json"): 
+        continue
+      changed.append((record, record_path))
+  walk(folder_id, directory)
+
+  def fetch(item):
+    record, path = item
+    try:
+      document = core.ELN.get_document(record['id'])
+      os.makedirs(path, exist_ok=True)
+      with open(f"{path}{os.sep}document.json", 'w') as fid: json.dump(document, fid, indent=2)
+      return record, path, core.get_files(document), None
+    except:
+      return record, path, [], traceback.format_exc()
+
+  def download(item):
+    global_id, file, filepath = item
+    try:
+      core.ELN.download_file(file['id'], filepath+'.part')
+      os.replace(filepath+'.part', filepath)
+      return global_id, file, filepath, None
+    except:
+      return global_id, file, filepath, traceback.format_exc()
+
+  def remove(filepath):
+    manifest['files'].pop(filepath, None)
+    if os.path.isfile(filepath): os.remove(filepath)
+
+  downloads, fetched, downloaded, deleted, errors = [], 0, 0, 0, dict()
+  try:
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+      for record, path, files, error in pool.map(fetch, changed):
+        if error is not None:
+          print(f"WARNING: could not fetch {record['globalId']}:\n{error}")
+          errors[record['globalId']] = error
+          continue
+        fetched += 1
+        filepaths = [f"{path}{os.sep}{file['globalId']}_{_safe_name(file['name'])}" for file in files]
+        known = manifest['documents'].get(record['globalId'])
+        if delete and known is not None:
+          for filepath in known['files']:
+            if filepath not in filepaths: remove(filepath)
+        manifest['documents'][record['globalId']] = {'lastModified': record.get('lastModified'), 'path': path, 
+                                                     'files': filepaths}
+        for file, filepath in zip(files, filepaths):
+          known = manifest['files'].get(filepath)
+          if known is not None and os.path.isfile(filepath) \
+            and known['size'] == file.get('size') and known['version'] == file.get('version'):
+            continue
+          downloads.append((record['globalId'], file, filepath))
+
+      for global_id, file, filepath, error in pool.map(download, downloads):
+        if error is not None:
+          print(f"WARNING: could not download {file['globalId']} of {global_id}:\n{error}")
+          errors[file['globalId']] = error
+          # fetch the document again on the next run
+          manifest['documents'][global_id]['lastModified'] = None
+          continue
+        manifest['files'][filepath] = {'globalId': file['globalId'], 'size': file.get('size'), 'version': file.get('version')}
+        downloaded += 1
+
+    if delete:
+      for global_id in [key for key in manifest['documents'] if key not in seen]:
+        document = manifest['documents'].pop(global_id)
+        for filepath in document['files'] + [f"{document['path']}{os.sep}document.json"]: remove(filepath)
+        try: os.removedirs(document['path'])
+        except OSError: pass
+        deleted += 1
+
+  finally:
+    with open(manifest_path+'.tmp', 'w') as fid: json.dump(manifest, fid)
+    os.replace(manifest_path+'.tmp', manifest_path)
+
+  return {'fetched': fetched, 'unchanged': len(seen)-len(changed), 'deleted': deleted, 'downloaded': downloaded, 'errors': errors}
+
+
+
+def _extract_field(content, file, delimiter, replace):
+  try:
+    files = core.tables_from_xml(content, file, delimiter=delimiter, replace=replace)
+  except:
+    return [], traceback.format_exc()
+  tables = []
+  for filepath in files:
+    with open(filepath) as fid: tables.append((filepath, sum(1 for line in fid)))
+  return tables, None
+
+def extract_tables(folder_id, directory, form_pattern=None, recursive=True, delimiter=',', 
+                   replace=core.replace, max_workers=8, processes=None):
+  """Extract the tables embedded in all documents of an RSpace folder or 
+  notebook to csv files using `core.tables_from_xml`.
+
+  Documents are fetched concurrently in threads, while the fields containing
+  tables are parsed in a pool of worker processes. The output files are named
+  `<globalId>_<field name>_<number>.csv` and a manifest `tables.json` listing 
+  all tables with their number of rows is written to `directory`.
+
+  Parameters
+  ----------
+  folder_id : str
+      folderID of the Rspace folder or notebook
+  directory : str
+      output directory
+  form_pattern : str, optional
+      glob-style pattern that the form name of documents must match
+  recursive : bool, optional
+      if `True`, documents in subfolders are included as well
+  delimiter : str, optional
+      field delimiter to be used in the csv files
+  replace : dict, optional
+      replacements applied to cell values (see `core.tables_from_xml`)
+  max_workers : int, optional
+      maximum number of concurrent requests
+  processes : int, optional
+      number of worker processes parsing tables. Defaults to the number of CPUs.
+
+  Returns
+  -------
+  manifest : dict
+      'tables': list of dicts with the keys 'globalId', 'document', 'field',
+      'file' and 'rows', and 'errors': list of dicts with the keys 'globalId',
+      'field' and 'error' for fields that could not be parsed, or with 'field'
+      None for documents that could not be fetched.
+  """
+  os.makedirs(directory, exist_ok=True)
+  records = []
+  def walk(folder):
+    for record in core.iter_folder_tree(folder):
+      if record['type'] == 'NOTEBOOK' or (recursive and record['type'] == 'FOLDER'): walk(record['id'])
+      elif record['type'] == 'DOCUMENT': records.append(record)
+  walk(folder_id)
+
+  def fetch(record):
+    try: return record, core.ELN.get_document(record['id']), None
+    except: return record, None, traceback.format_exc()
+
+  jobs = []
+  manifest = {'tables': [], 'errors': []}
+  with ThreadPoolExecutor(max_workers=max_workers) as threads, ProcessPoolExecutor(max_workers=processes) as pool:
+    for record, document, error in threads.map(fetch, records):
+      if error is not None:
+        print(f"WARNING: could not fetch {record['globalId']}:\n{error}")
+        manifest['errors'].append({'globalId': record['globalId'], 'field': None, 'error': error})
+        continue
+      if form_pattern is not None and not fnmatch(document['form']['name'], form_pattern): continue
+      for field in document['fields']:
+        content = field.get('content')
+        if not isinstance(content, str) or '<tbody' not in content: continue
+        file = f"{directory}{os.sep}{document['globalId']}_{_safe_name(field['name']).replace(' ', '_')}.csv"
+        jobs.append((document, field, pool.submit(_extract_field, content, file, delimiter, replace)))
+
+    for document, field, future in jobs:
+      tables, error = future.result()
+      if error is not None:
+        print(f"WARNING: could not extract tables from {document['globalId']} ({field['name']}):\n{error}")
+        manifest['errors'].append({'globalId': document['globalId'], 'field': field['name'], 'error': error})
+      for filepath, rows in tables:
+        manifest['tables'].append({'globalId': document['globalId'], 'document': document['name'], 
+                                   'field': field['name'], 'file': os.path.basename(filepath), 'rows': rows})
+
+  with open(f"{directory}{os.sep}tables.json", 'w') as fid: json.dump(manifest, fid, indent=2)
+  return manifest
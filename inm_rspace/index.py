@@ -0,0 +1,288 @@
+"""
+----------
+ Examples
+----------
+
+Keep a local index of a folder and search it:
+---------------------------------------------
+
+.. code-block:: python
+
+    import inm_rspace as rs
+
+    index = rs.index.DocumentIndex('/scratch/rspace_index.sqlite')
+    index.sync_folder(rs.workflow.SHARED_FOLDER_ID)
+
+    ids = index.search('temperature', field='Arguments (JSON)')
+    ids = index.find('Workflow', 'PlotColumnsCSV')
+    ids = index.linking('SA1234')
+    docs = [index.get(global_id) for global_id in ids]
+
+`sync_folder` only fetches documents whose modification time changed since
+they were indexed. Queries are answered from the local SQLite file without
+any requests to the server.
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import re
+import json
+import html
+import sqlite3
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from . import core
+
+
+
+def strip_html(content):
+  """plain text of an html string, such as the content of a document field.
+  """
+  if not isinstance(content, str): return '' if content is None else str(content)
+  text = re.sub(r'<br\s*/?>|</p>|</div>|</tr>|</li>', '\n', content)
+  text = re.sub(r'<[^>]*>', ' ', text)
+  text = html.unescape(text)
+  return re.sub(r'[ \t]+', ' ', text).strip()
+
+
+
+class DocumentIndex:
+  """Local full-text and field index of RSpace documents in an SQLite file.
+
+  Documents are stored with their modification time, so that only documents
+  that changed since they were indexed need to be fetched again. Field
+  contents are indexed as plain text with SQLite FTS5, in an external-content
+  table kept in sync with the field values by triggers.
+
+  Parameters
+  ----------
+  path : str
+      path of the SQLite database file
+  """
+  def __init__(self, path):
+    self.path = path
+    with self._connect() as db:
+      db.execute("""CREATE TABLE IF NOT EXISTS documents (
+        globalId TEXT PRIMARY KEY, name TEXT, form TEXT, lastModified TEXT, document TEXT)""")
+      db.execute("CREATE TABLE IF NOT EXISTS fields (id INTEGER PRIMARY KEY, globalId TEXT, name TEXT, value TEXT)")
+      db.execute("CREATE INDEX IF NOT EXISTS fields_value ON fields (name, value)")
+      db.execute("CREATE INDEX IF NOT EXISTS fields_document ON fields (globalId)")
+      db.execute("CREATE TABLE IF NOT EXISTS links (globalId TEXT, linked TEXT)")
+      db.execute("CREATE INDEX IF NOT EXISTS links_linked ON links (linked)")
+      db.execute("CREATE INDEX IF NOT EXISTS links_document ON links (globalId)")
+      db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS text USING fts5(value, content='fields', content_rowid='id')")
+      db.execute("""CREATE TRIGGER IF NOT EXISTS fields_insert AFTER INSERT ON fields BEGIN
+        INSERT INTO text (rowid, value) VALUES (new.id, new.value); END""")
+      db.execute("""CREATE TRIGGER IF NOT EXISTS fields_delete AFTER DELETE ON fields BEGIN
+        INSERT INTO text (text, rowid, value) VALUES ('delete', old.id, old.value); END""")
+
+  def _connect(self):
+    db = sqlite3.connect(self.path, timeout=60)
+    db.row_factory = sqlite3.Row
+    return db
+
+  def __len__(self):
+    with self._connect() as db:
+      return db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+  def last_modified(self):
+    """modification times of all indexed documents by globalId.
+    """
+    with self._connect() as db:
+      return {row['globalId']: row['lastModified'] for row in db.execute('SELECT globalId, lastModified FROM documents')}
+
+  def add(self, documents):
+    """Add documents to the index or update them.
+
+    Parameters
+    ----------
+    documents : iterable<dict>
+        RSpace documents (can be a generator). Documents whose modification
+        time did not change since they were indexed are skipped.
+
+    Returns
+    -------
+    added : list<str>
+        globalIds of the added or updated documents
+    """
+    added = []
+    with self._connect() as db:
+      for document in documents:
+        global_id = document['globalId']
+        row = db.execute('SELECT lastModified FROM documents WHERE globalId=?', (global_id,)).fetchone()
+        if row is not None and row['lastModified'] == document.get('lastModified'): continue
+
+        self._delete(db, [global_id])
+        db.execute('INSERT INTO documents VALUES (?, ?, ?, ?, ?)', (global_id, document.get('name'),
+          document.get('form', {}).get('name'), document.get('lastModified'), json.dumps(document)))
+        for field in document['fields']:
+          value = strip_html(field.get('content'))
+          db.execute('INSERT INTO fields (globalId, name, value) VALUES (?, ?, ?)', (global_id, field['name'], value))
+        db.executemany('INSERT INTO links VALUES (?, ?)',
+          [(global_id, linked) for linked in core.document_links(document)])
+        # keep the documents indexed so far if a later one fails
+        db.commit()
+        added.append(global_id)
+    return added
+
+  def _delete(self, db, global_ids):
+    # full-text rows are deleted with their fields by trigger
+    for table in ('documents', 'fields', 'links'):
+      db.executemany(f'DELETE FROM {table} WHERE globalId=?', [(global_id,) for global_id in global_ids])
+
+  def remove(self, global_ids):
+    """Remove documents from the index.
+    """
+    with self._connect() as db: self._delete(db, list(global_ids))
+
+  def get(self, global_id):
+    """get an indexed document.
+
+    Returns
+    -------
+    document : dict or None
+        the document as it was when it was indexed, or None if it is not indexed
+    """
+    with self._connect() as db:
+      row = db.execute('SELECT document FROM documents WHERE globalId=?', (global_id,)).fetchone()
+    return None if row is None else json.loads(row['document'])
+
+  def search(self, query, field=None, form_pattern=None, limit=None):
+    """Full-text search in the field contents of the indexed documents.
+
+    Parameters
+    ----------
+    query : str
+        SQLite FTS5 query, e.g. 'temperature', '"step size"' or 'temp*'
+    field : str, optional
+        only search the fields with this name
+    form_pattern : str, optional
+        glob-style pattern that the form name must match
+    limit : int, optional
+        maximum number of results
+
+    Returns
+    -------
+    ids : list<str>
+        globalIds of matching documents, best matches first
+    """
+    sql = """SELECT fields.globalId FROM text JOIN fields ON fields.id=text.rowid
+      JOIN documents ON documents.globalId=fields.globalId WHERE text MATCH ?"""
+    args = [query]
+    if field is not None:
+      sql += ' AND fields.name=?'
+      args.append(field)
+    if form_pattern is not None:
+      sql += ' AND documents.form GLOB ?'
+      args.append(form_pattern)
+    with self._connect() as db:
+      ids = list(dict.fromkeys(row['globalId'] for row in db.execute(sql+' ORDER BY rank', args)))
+    return ids if limit is None else ids[:limit]
+
+  def find(self, field, value=None, pattern=None, form_pattern=None):
+    """Find documents by the (plain text) value of a field.
+
+    Parameters
+    ----------
+    field : str
+        field name
+    value : str, optional
+        exact field value
+    pattern : str, optional
+        glob-style pattern that the field value must match
+    form_pattern : str, optional
+        glob-style pattern that the form name must match
+
+    Returns
+    -------
+    ids : list<str>
+        globalIds of matching documents. If neither `value` nor `pattern`
+        is given, all documents with the field are returned.
+    """
+    sql = """SELECT DISTINCT fields.globalId FROM fields
+      JOIN documents ON documents.globalId=fields.globalId WHERE fields.name=?"""
+    args = [field]
+    if value is not None:
+      sql += ' AND fields.value=?'
+      args.append(value)
+    if pattern is not None:
+      sql += ' AND fields.value GLOB ?'
+      args.append(pattern)
+    if form_pattern is not None:
+      sql += ' AND documents.form GLOB ?'
+      args.append(form_pattern)
+    with self._connect() as db:
+      return [row['globalId'] for row in db.execute(sql+' ORDER BY fields.globalId', args)]
+
+  def linking(self, global_id):
+    """Find documents that link to or attach an RSpace object, e.g. a sample
+    or a gallery file (see `core.document_links`).
+
+    Returns
+    -------
+    ids : list<str>
+        globalIds of the linking documents
+    """
+    with self._connect() as db:
+      rows = db.execute('SELECT DISTINCT globalId FROM links WHERE linked=? ORDER BY globalId', (global_id,))
+      return [row['globalId'] for row in rows]
+
+  def sync_folder(self, folder_id, recursive=True, max_workers=8, delete=False):
+    """Bring the index up to date with the documents in an RSpace folder or
+    notebook, fetching only documents that are new or were modified.
+
+    Parameters
+    ----------
+    folder_id : str
+        folderID of the Rspace folder or notebook
+    recursive : bool, optional
+        if `True`, documents in subfolders are included as well. Documents
+        in notebooks are always included.
+    max_workers : int, optional
+        maximum number of concurrent requests
+    delete : bool, optional
+        if `True`, indexed documents that are no longer in the folder tree
+        are removed from the index.
+
+    Returns
+    -------
+    summary : dict
+        numbers of fetched, unchanged and removed documents, and errors by
+        globalId of the documents that could not be fetched ('errors'). These
+        are fetched again on the next sync.
+    """
+    known = self.last_modified()
+    changed, seen = [], set()
+    def walk(folder):
+      for record in core.iter_folder_tree(folder):
+        if record['type'] == 'NOTEBOOK' or (recursive and record['type'] == 'FOLDER'):
+          walk(record['id'])
+          continue
+        if record['type'] != 'DOCUMENT': continue
+        seen.add(record['globalId'])
+        if known.get(record['globalId']) != record.get('lastModified'): changed.append(record)
+    walk(folder_id)
+
+    def fetch(record):
+      try: return record, core.ELN.get_document(record['id']), None
+      except: return record, None, traceback.format_exc()
+
+    errors = dict()
+    def fetched():
+      for record, document, error in pool.map(fetch, changed):
+        if error is None:
+          yield document
+          continue
+        print(f"WARNING: could not fetch {record['globalId']}:\n{error}")
+        errors[record['globalId']] = error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+      self.add(fetched())
+
+    removed = [global_id for global_id in known if global_id not in seen] if delete else []
+    self.remove(removed)
+    return {'fetched': len(changed)-len(errors), 'unchanged': len(seen)-len(changed), 'removed': len(removed),
+            'errors': errors}
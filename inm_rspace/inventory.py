@@ -0,0 +1,375 @@
+"""
+----------
+ Examples
+----------
+
+Iterate over all samples and look up their subsamples:
+-------------------------------------------------------
+
+.. code-block:: python
+
+    import inm_rspace as rs
+
+    lookup = rs.inventory.ItemLookup(max_workers=8)
+    for sample in rs.inventory.iter_samples(page_size=200):
+      subsamples = lookup.get_many(sub['globalId'] for sub in sample['subSamples'])
+      ...
+
+The next page of a listing is requested in the background while the current
+one is processed. `ItemLookup` fetches each globalId only once, even if it is
+requested repeatedly or by several threads at the same time.
+
+Register a shipment of samples from a CSV file:
+-----------------------------------------------
+
+.. code-block:: python
+
+    summary = rs.inventory.create_samples('shipment.csv', name_column='Sample ID', 
+                                          tags_column='Project', progress='shipment.log')
+
+All other columns become extra fields, whose type (number or text) is 
+inferred from the column values. Samples are created with the bulk API in
+parallel batches. If the import is interrupted, running it again with the same
+progress log only creates the samples that are still missing.
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import csv
+import time
+import threading
+import requests
+from urllib3.exceptions import NewConnectionError
+from datetime import date
+from concurrent.futures import Future, ThreadPoolExecutor
+from rspace_client.client_base import Pagination
+from rspace_client.inv.inv import InventoryClient, SamplePost, ExtraField, ExtraFieldType
+from . import core
+
+
+
+# listing method of the Inventory client by collection name
+LISTINGS = {
+  'samples': 'list_samples',
+  'containers': 'list_top_level_containers',
+  'subSamples': 'list_subsamples',
+}
+# HTTP status codes of requests that were rejected before they were processed
+RETRY_STATUSES = (429, 502, 503)
+
+
+
+def iter_items(collection, page_size=100, prefetch=True, sample_filter=None):
+  """iterate over all items of an Inventory collection, page by page.
+
+  Parameters
+  ----------
+  collection : str
+      'samples', 'containers' (top-level containers) or 'subSamples'
+  page_size : int, optional
+      number of items per request
+  prefetch : bool, optional
+      if `True`, the next page is requested in a background thread while
+      the items of the current page are consumed
+  sample_filter : rspace_client.inv.inv.SearchFilter, optional
+      filter passed on to the listing request
+
+  Yields
+  ------
+  item : dict
+      the next item of the collection
+  """
+  listing_method = getattr(core.Inventory, LISTINGS[collection])
+  def fetch(page):
+    return listing_method(Pagination(page_number=page, page_size=page_size), sample_filter)
+
+  with ThreadPoolExecutor(max_workers=1) as pool:
+    page = 0
+    future = pool.submit(fetch, page)
+    while future is not None:
+      listing = future.result()
+      page += 1
+      more = page*page_size < listing.get('totalHits', 0) and len(listing[collection]) > 0
+      future = None
+      if more and prefetch: future = pool.submit(fetch, page)
+      yield from listing[collection]
+      if more and not prefetch: future = pool.submit(fetch, page)
+
+def iter_samples(page_size=100, prefetch=True, sample_filter=None):
+  """iterate over all Inventory samples (see `iter_items`).
+  """
+  return iter_items('samples', page_size=page_size, prefetch=prefetch, sample_filter=sample_filter)
+
+def iter_containers(page_size=100, prefetch=True, sample_filter=None):
+  """iterate over all top-level Inventory containers (see `iter_items`).
+  """
+  return iter_items('containers', page_size=page_size, prefetch=prefetch, sample_filter=sample_filter)
+
+def iter_subsamples(page_size=100, prefetch=True, sample_filter=None):
+  """iterate over all Inventory subsamples (see `iter_items`).
+  """
+  return iter_items('subSamples', page_size=page_size, prefetch=prefetch, sample_filter=sample_filter)
+
+
+
+class ItemLookup:
+  """Batched lookup of Inventory (or ELN) objects by globalId.
+  Concurrent requests for the same globalId are coalesced into one request
+  and fetched objects are kept, so that every object is only requested once.
+
+  Parameters
+  ----------
+  max_workers : int, optional
+      maximum number of concurrent requests
+  """
+  def __init__(self, max_workers=8):
+    self.max_workers = max_workers
+    self.futures = dict()
+    self.lock = threading.Lock()
+    self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+  def _submit(self, global_id):
+    with self.lock:
+      future = self.futures.get(global_id)
+      if future is None:
+        future = self.futures[global_id] = self.pool.submit(core.get_object, global_id)
+      return future
+
+  def get_many(self, global_ids):
+    """get many objects by their globalIds.
+
+    Parameters
+    ----------
+    global_ids : iterable<str>
+        globalIds, e.g. 'SA123', 'SS456' or 'IC789'. Duplicates are only
+        fetched once.
+
+    Returns
+    -------
+    objects : dict
+        objects by globalId. Objects that could not be fetched are missing
+        and a warning is printed; they are requested again on the next call.
+    """
+    futures = {global_id: self._submit(global_id) for global_id in dict.fromkeys(global_ids)}
+    objects = dict()
+    for global_id, future in futures.items():
+      try: objects[global_id] = future.result()
+      except Exception as error:
+        print(f"WARNING: could not fetch {global_id}: {error}")
+        with self.lock:
+          if self.futures.get(global_id) is future: del self.futures[global_id]
+    return objects
+
+  def get(self, global_id):
+    """get a single object by its globalId.
+
+    Raises
+    ------
+    KeyError
+        raised if the object could not be fetched
+    """
+    objects = self.get_many([global_id])
+    if global_id not in objects: raise KeyError(global_id)
+    return objects[global_id]
+
+  def add(self, objects):
+    """add objects that are already known, e.g. from a listing, so that they
+    are not requested again.
+    """
+    with self.lock:
+      for obj in objects:
+        future = Future()
+        future.set_result(obj)
+        self.futures[obj['globalId']] = future
+
+  def clear(self):
+    """forget all fetched objects.
+    """
+    with self.lock: self.futures.clear()
+
+  def close(self):
+    self.pool.shutdown()
+
+
+
+def read_table(table):
+  """rows of a CSV file or pandas DataFrame as dicts by column name.
+  Empty cells are omitted.
+  """
+  if isinstance(table, str):
+    with open(table, newline='') as fid:
+      rows = list(csv.DictReader(fid))
+  else:
+    rows = table.to_dict('records')
+  return [{key: value for key, value in row.items() if not _is_empty(value)} for row in rows]
+
+def _is_empty(value):
+  return value is None or value == '' or (isinstance(value, float) and value != value)
+
+def extra_field_type(values):
+  """Inventory extra field type for a column with the given values, inferred 
+  in the same way as `core.form_fields_from_json` infers Form field types.
+
+  Parameters
+  ----------
+  values : iterable
+      column values (empty values are ignored)
+
+  Returns
+  -------
+  field_type : ExtraFieldType
+      NUMBER if all values are numbers or numeric strings, TEXT otherwise
+  """
+  for value in values:
+    if isinstance(value, bool): return ExtraFieldType.TEXT
+    if isinstance(value, (int, float)): continue
+    try: float(value)
+    except (TypeError, ValueError): return ExtraFieldType.TEXT
+  return ExtraFieldType.NUMBER
+
+def _content(value, field_type):
+  if field_type == ExtraFieldType.NUMBER: return value if isinstance(value, (int, float)) else float(value)
+  if isinstance(value, date): return value.isoformat()
+  return str(value)
+
+def sample_posts(rows, name_column='name', description_column=None, tags_column=None, 
+                 extra_columns=None, sample_template_id=None):
+  """Convert table rows into Inventory samples to be created.
+
+  Parameters
+  ----------
+  rows : list<dict>
+      table rows, e.g. from `read_table`
+  name_column : str, optional
+      column holding the sample names
+  description_column : str, optional
+      column holding the sample descriptions
+  tags_column : str, optional
+      column holding comma-separated sample tags
+  extra_columns : list<str>, optional
+      columns stored as extra fields. By default, all other columns.
+  sample_template_id : str, optional
+      id of the sample template to use
+
+  Returns
+  -------
+  posts : list<SamplePost>
+      one sample per row
+
+  Raises
+  ------
+  ValueError
+      raised if a row has no value in `name_column`
+  """
+  for i, row in enumerate(rows):
+    if row.get(name_column) is None: raise ValueError(f"row {i+1} has no value in column '{name_column}'")
+  if extra_columns is None:
+    extra_columns = list(dict.fromkeys(key for row in rows for key in row))
+    extra_columns = [key for key in extra_columns if key not in (name_column, description_column, tags_column)]
+  types = {column: extra_field_type(row[column] for row in rows if column in row) for column in extra_columns}
+
+  posts = []
+  for row in rows:
+    tags = [{'value': tag.strip()} for tag in str(row.get(tags_column, '')).split(',') if tag.strip()] \
+      if tags_column is not None else []
+    extra_fields = [ExtraField(column, field_type, _content(row[column], field_type)) 
+                    for column, field_type in types.items() if column in row]
+    posts.append(SamplePost(str(row[name_column]), tags=tags, extra_fields=extra_fields,
+                            description=row.get(description_column) if description_column is not None else None,
+                            sample_template_id=sample_template_id))
+  return posts
+
+def _not_processed(error):
+  """Check if a failed request certainly did not reach the server or was 
+  rejected by it before being processed, so that it can be sent again.
+  """
+  status = getattr(error, 'response_status_code', None)
+  if status is not None: return status in RETRY_STATUSES
+  # connection errors of rspace_client wrap the error raised by requests
+  cause = error.args[0] if error.args else None
+  if isinstance(cause, requests.exceptions.ConnectTimeout): return True
+  if isinstance(cause, requests.exceptions.ConnectionError):
+    reason = getattr(cause.args[0] if cause.args else None, 'reason', None)
+    return isinstance(reason, NewConnectionError)
+  return False
+
+def create_samples(table, name_column='name', description_column=None, tags_column=None, 
+                   extra_columns=None, sample_template_id=None, key_column=None, progress=None, 
+                   batch_size=InventoryClient.MAX_BULK, max_workers=4, retries=3):
+  """Create Inventory samples from the rows of a table using the bulk API.
+
+  Parameters
+  ----------
+  table : str or pandas.DataFrame
+      CSV file or DataFrame with one sample per row
+  name_column, description_column, tags_column, extra_columns, sample_template_id
+      see `sample_posts`
+  key_column : str, optional
+      column uniquely identifying a row in the progress log. Defaults to `name_column`.
+  progress : str or core.ProgressLog, optional
+      progress log of the created samples. Rows found in the log are skipped,
+      so that an interrupted import can be resumed.
+  batch_size : int, optional
+      number of samples per bulk request (at most `InventoryClient.MAX_BULK`)
+  max_workers : int, optional
+      number of bulk requests sent in parallel
+  retries : int, optional
+      number of times a failing bulk request is repeated
+
+  Returns
+  -------
+  summary : dict
+      globalIds of the created samples by key ('created'), number of rows 
+      skipped because they were already created ('skipped') and errors by 
+      key of the rows that could not be created ('failed'). Rows without a
+      name or key are reported as 'row <number>'.
+
+  Requests are only repeated if they certainly did not create anything, i.e.
+  if the connection could not be established or the server responded with 
+  one of `RETRY_STATUSES`. After other errors, e.g. read timeouts, the samples
+  of the batch are reported as failed, since they might have been created.
+  """
+  if key_column is None: key_column = name_column
+  if isinstance(progress, str): progress = core.ProgressLog(progress)
+  rows = read_table(table)
+  invalid = {f"row {i+1}": f"no value in column '{column}'" for i, row in enumerate(rows) 
+             for column in dict.fromkeys((name_column, key_column)) if column not in row}
+  rows = [row for row in rows if name_column in row and key_column in row]
+  posts = sample_posts(rows, name_column=name_column, description_column=description_column, 
+                       tags_column=tags_column, extra_columns=extra_columns, 
+                       sample_template_id=sample_template_id)
+  keys = [str(row[key_column]) for row in rows]
+  todo = [(key, post) for key, post in zip(keys, posts) if progress is None or key not in progress]
+  batch_size = min(batch_size, InventoryClient.MAX_BULK)
+  batches = [todo[i:i+batch_size] for i in range(0, len(todo), batch_size)]
+
+  def create(batch):
+    for attempt in range(retries+1):
+      try:
+        result = core.Inventory.bulk_create_sample(*[post for key, post in batch])
+        break
+      except Exception as error:
+        if attempt == retries or not _not_processed(error): return dict(), {key: str(error) for key, post in batch}
+        time.sleep(2**attempt)
+
+    created, failed = dict(), dict()
+    for (key, post), item in zip(batch, result.results()):
+      if item.get('record') is not None:
+        created[key] = item['record']['globalId']
+        if progress is not None: progress.add(key, created[key])
+      else:
+        failed[key] = item.get('error')
+    if result.is_failed():
+      for key, post in batch: 
+        if key not in created and key not in failed: failed[key] = result.data.get('status')
+    return created, failed
+
+  summary = {'created': dict(), 'skipped': len(rows)-len(todo), 'failed': invalid}
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    for created, failed in pool.map(create, batches):
+      summary['created'].update(created)
+      summary['failed'].update(failed)
+  return summary
@@ -0,0 +1,177 @@
+"""
+----------
+ Examples
+----------
+
+Re-create all documents of a notebook on a new version of their Form:
+---------------------------------------------------------------------
+
+.. code-block:: python
+
+    import inm_rspace as rs
+
+    documents = rs.get_docs_in_notebook(7074, form_pattern='UV-vis v1')
+    new_form = rs.ELN.get_form('FM123')
+    plan = rs.migration.plan_migration(documents[0]['fields'], new_form['fields'],
+                                       term_map={'Wavelength (nm)': 'Wavelength'})
+    print(plan['dropped'], plan['missing'])
+
+    summary = rs.migration.migrate_documents(documents, new_form, plan, dry_run=True)
+    summary = rs.migration.migrate_documents(documents, new_form, plan, progress='uv-vis_v2.log')
+
+The field contents are copied as they are, so that links and attachments keep
+referring to the same gallery files instead of being uploaded again. If the
+migration is interrupted, running it again with the same progress log skips
+the documents that were already migrated.
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from . import core
+
+
+
+def plan_migration(old_fields, new_fields, term_map={}):
+  """Plan which fields of existing documents are transferred to which fields
+  of a new Form. Fields are matched by name (see `core.fields_are_compatible`),
+  unless the `term_map` maps a new field to an old field of another name.
+
+  Parameters
+  ----------
+  old_fields : list<dict>
+      fields of the existing documents (or their Form) containing at least
+      the keys 'name' and 'type'
+  new_fields : list<dict>
+      fields of the new Form containing at least the keys 'name' and 'type'
+  term_map : dict, optional
+      map between field names in the new Form (keys) and in the existing
+      documents (values), as in `core.fill_form_fields`
+
+  Returns
+  -------
+  plan : dict
+      'map': names of the old fields by the names of the new fields they are
+      transferred to, 'dropped': old fields that are not transferred, 'missing':
+      new fields that remain empty, 'conflicts': (new, old) field names that
+      match but whose types differ. Conflicting fields are not transferred.
+
+  Raises
+  ------
+  KeyError
+      raised if the `term_map` contains fields that do not exist
+  """
+  old_types = {field['name']: field['type'].lower() for field in old_fields}
+  new_types = {field['name']: field['type'].lower() for field in new_fields}
+  for new_name, old_name in term_map.items():
+    if new_name not in new_types: raise KeyError(f"map term '{new_name}' not in new form fields")
+    if old_name not in old_types: raise KeyError(f"map term '{old_name}' not in document fields")
+
+  plan = {'map': dict(), 'dropped': [], 'missing': [], 'conflicts': []}
+  for new_name, new_type in new_types.items():
+    old_name = term_map.get(new_name, new_name)
+    if old_name not in old_types:
+      plan['missing'].append(new_name)
+    elif old_types[old_name] != new_type:
+      plan['conflicts'].append((new_name, old_name))
+    else:
+      plan['map'][new_name] = old_name
+  mapped = set(plan['map'].values())
+  plan['dropped'] = [name for name in old_types if name not in mapped]
+  return plan
+
+def migrated_fields(document, new_fields, plan):
+  """Document fields for a new Form filled with the contents of an existing document.
+
+  Returns
+  -------
+  fields : list<dict>
+      list of {'content': ...} dicts in the order of `new_fields`
+  """
+  contents = {field['name']: field.get('content') for field in document['fields']}
+  fields = []
+  for field in new_fields:
+    old_name = plan['map'].get(field['name'])
+    content = contents.get(old_name) if old_name is not None else None
+    fields.append({'content': '' if content is None else content})
+  return fields
+
+def migrate_documents(documents, new_form, plan=None, term_map={}, parent_folder_id=None,
+                      dry_run=False, progress=None, max_workers=8):
+  """Re-create existing documents on a new Form concurrently.
+
+  All documents must use the same Form as the first one, from whose fields
+  the plan is made. Documents using another Form are not migrated and are
+  reported as failed.
+
+  Parameters
+  ----------
+  documents : iterable<dict>
+      existing RSpace documents, e.g. from `core.get_docs_in_folder`
+  new_form : dict
+      the new RSpace Form
+  plan : dict, optional
+      field transfer planned with `plan_migration`. By default, it is planned
+      from the fields of the first document and `term_map`.
+  term_map : dict, optional
+      see `plan_migration`
+  parent_folder_id : str, optional
+      folder in which the new documents are created. Defaults to the folder
+      of each existing document.
+  dry_run : bool, optional
+      if `True`, nothing is created and the fields that would be sent are
+      returned instead.
+  progress : str or core.ProgressLog, optional
+      progress log mapping the globalIds of migrated documents to the
+      globalIds of their new counterparts. Documents found in the log are
+      skipped, so that an interrupted migration can be resumed.
+  max_workers : int, optional
+      maximum number of concurrent requests
+
+  Returns
+  -------
+  summary : dict
+      'created': new globalIds (or fields in a dry run) by old globalId,
+      'skipped': number of documents already migrated according to the log,
+      'failed': errors by old globalId
+  """
+  documents = list(documents)
+  if isinstance(progress, str): progress = core.ProgressLog(progress)
+  if plan is None and len(documents): plan = plan_migration(documents[0]['fields'], new_form['fields'], term_map)
+  todo = [document for document in documents if progress is None or document['globalId'] not in progress]
+
+  failed = dict()
+  if len(documents):
+    form = documents[0].get('form', {})
+    for document in todo:
+      if str(document.get('form', {}).get('id')) == str(form.get('id')): continue
+      failed[document['globalId']] = f"Form {document.get('form', {}).get('globalId')} differs from Form {form.get('globalId')} of the planned migration."
+      print(f"WARNING: could not migrate {document['globalId']}: {failed[document['globalId']]}")
+    todo = [document for document in todo if document['globalId'] not in failed]
+
+  def migrate(document):
+    fields = migrated_fields(document, new_form['fields'], plan)
+    if dry_run: return fields
+    folder_id = parent_folder_id if parent_folder_id is not None else document.get('parentFolderId')
+    new_document = core.ELN.create_document(name=document['name'], parent_folder_id=folder_id,
+                                            tags=document.get('tags'), form_id=new_form['id'], fields=fields)
+    if progress is not None: progress.add(document['globalId'], new_document['globalId'])
+    return new_document['globalId']
+
+  def run(document):
+    try: return document['globalId'], migrate(document), None
+    except: return document['globalId'], None, traceback.format_exc()
+
+  summary = {'created': dict(), 'skipped': len(documents)-len(todo)-len(failed), 'failed': failed}
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    for global_id, result, error in pool.map(run, todo):
+      if error is None:
+        summary['created'][global_id] = result
+      else:
+        print(f"WARNING: could not migrate {global_id}:\n{error}")
+        summary['failed'][global_id] = error
+  return summary
@@ -0,0 +1,1004 @@
+"""
+----------
+ Examples
+----------
+
+Run all pending requests for a workflow on every core of the processing node:
+
+.. code-block:: python
+
+    import inm_rspace as rs
+    from my_workflows import PlotColumnsCSV
+
+    requests = rs.get_requests(rs.workflow.SHARED_FOLDER_ID)
+    workflows = [PlotColumnsCSV(doc) for doc in requests]
+    with rs.runner.WorkflowExecutor(timeout=3600, memory=8*1024**3) as executor:
+      codes = executor.run(workflows)
+
+Each workflow runs in a separate worker process, in which numpy, pandas and
+matplotlib have already been imported. A workflow that runs out of time or
+memory, or crashes its worker process, is reported as 'FAILED_WORKFLOW' in
+its RSpace document.
+
+Pass a `Scheduler` to run short requests first, based on the recorded run 
+times of previous requests:
+
+.. code-block:: python
+
+    scheduler = rs.runner.Scheduler(rs.runner.RuntimeHistory())
+    with rs.runner.WorkflowExecutor(scheduler=scheduler, memory_total=64*1024**3) as executor:
+      codes = executor.run(workflows)
+
+Share requests between several processing nodes:
+-------------------------------------------------
+
+.. code-block:: python
+
+    queue = rs.runner.JobQueue('/shared/rspace_jobs.sqlite', ttl=600)
+    queue.add(rs.get_requests(rs.workflow.SHARED_FOLDER_ID), PlotColumnsCSV)
+    rs.runner.run_queue(queue, PlotColumnsCSV)
+
+Every node leases one request at a time, so no request is processed twice.
+Leases of crashed nodes expire after `ttl` seconds and the request is retried.
+
+Download and upload files in the background while a workflow computes:
+-----------------------------------------------------------------------
+
+.. code-block:: python
+
+    workflows = [PlotColumnsCSV(doc) for doc in requests]
+    codes = rs.runner.run_pipelined(workflows, prefetch=2)
+
+Process all pending requests of a workflow in one batch:
+--------------------------------------------------------
+
+.. code-block:: python
+
+    codes = rs.runner.run_batch(PlotColumnsCSV, requests, batch_size=50)
+
+Redefine `Workflow.workflow_batch(self, items)` to set up expensive resources
+only once per batch.
+
+Reset all requests of a workflow after a bug fix and check their status:
+------------------------------------------------------------------------
+
+.. code-block:: python
+
+    result = rs.runner.reset_requests(PlotColumnsCSV, folder_id=rs.workflow.SHARED_FOLDER_ID)
+    print(rs.runner.status_report(folder_id=rs.workflow.SHARED_FOLDER_ID))
+
+-------------------
+ API documentation
+-------------------
+
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import socket
+import sqlite3
+import threading
+import importlib
+import traceback
+import multiprocessing
+from datetime import datetime
+from multiprocessing.connection import wait
+from concurrent.futures import ThreadPoolExecutor
+try: import resource
+except ImportError: resource = None
+from . import core
+from .workflow import ERROR_CODE, ERROR_NAME, HOME, Workflow
+
+
+
+PRELOAD = ('numpy', 'pandas', 'matplotlib', 'matplotlib.pyplot')
+POLL_INTERVAL = 1.0
+RETRY_CODES = (ERROR_CODE['FAILED_DOWNLOAD'], ERROR_CODE['FAILED_UPLOAD'])
+MAX_SKIPS = 10
+
+
+
+def _set_memory_limit(limit):
+  """Limit the address space of the current process to `limit` bytes
+  (or lift the limit if `limit` is None).
+  """
+  if resource is None: return
+  soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+  if limit is None: limit = hard
+  elif hard != resource.RLIM_INFINITY: limit = min(limit, hard)
+  resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def _worker(conn, preload, memory):
+  """Main loop of a worker process: import heavy modules once, then run
+  the workflows received through `conn` and send back their results.
+  """
+  for module in preload:
+    try: importlib.import_module(module)
+    except ImportError: pass
+
+  while True:
+    try: wf = conn.recv()
+    except EOFError: break
+    if wf is None: break
+
+    limit = wf.resources.get('memory') or memory
+    # an error outside of `wf.workflow()` may leave the request document without results
+    unfinished = False
+    try:
+      _set_memory_limit(limit)
+      wf.run()
+    except:
+      wf.traceback += traceback.format_exc()
+      if not wf.code: wf.code = ERROR_CODE['FAILED_WORKFLOW']
+      unfinished = True
+    finally:
+      _set_memory_limit(None)
+
+    conn.send((wf.code, wf.info, wf.traceback, wf.output_files, unfinished))
+  conn.close()
+
+
+
+class RuntimeHistory:
+  """Record of the run times and input sizes of previous workflow runs, 
+  saved in a JSON file.
+
+  Parameters
+  ----------
+  path : str, optional
+      path of the JSON file
+  samples : int, optional
+      number of most recent runs kept per workflow
+  """
+  def __init__(self, path=f"{HOME}{os.sep}.inm_rspace_runtimes.json", samples=100):
+    self.path = path
+    self.samples = samples
+    try:
+      with open(path) as fid: self.runs = json.load(fid)
+    except (OSError, ValueError):
+      self.runs = dict()
+
+  def record(self, name, size, seconds):
+    """Add a run of a workflow to the history.
+
+    Parameters
+    ----------
+    name : str
+        name of the workflow
+    size : int
+        total size of the input files in bytes
+    seconds : float
+        run time in seconds
+    """
+    runs = self.runs.setdefault(name, [])
+    runs.append([size, seconds])
+    del runs[:-self.samples]
+    with open(self.path+'.tmp', 'w') as fid: json.dump(self.runs, fid)
+    os.replace(self.path+'.tmp', self.path)
+
+  def estimate(self, name, size, default=None):
+    """Estimate the run time of a workflow from a linear fit of previous run 
+    times against input sizes.
+
+    Parameters
+    ----------
+    name : str
+        name of the workflow
+    size : int
+        total size of the input files in bytes
+    default : float, optional
+        run time returned for workflows without history
+
+    Returns
+    -------
+    seconds : float
+        expected run time in seconds
+    """
+    runs = self.runs.get(name, [])
+    if not runs: return default
+    mean_size = sum(run[0] for run in runs)/len(runs)
+    mean_time = sum(run[1] for run in runs)/len(runs)
+    variance = sum((run[0]-mean_size)**2 for run in runs)
+    if variance == 0: return mean_time
+    slope = sum((run[0]-mean_size)*(run[1]-mean_time) for run in runs)/variance
+    slope = max(slope, 0.)
+    return max(mean_time + slope*(size-mean_size), 0.)
+
+
+
+class Scheduler:
+  """Order requests by their expected run time (shortest first), with aging
+  so that long requests are not postponed forever.
+
+  The priority of a request is its expected run time minus `aging` times the
+  number of seconds since the request document was last modified. Requests 
+  with lower values are run first.
+
+  Parameters
+  ----------
+  history : RuntimeHistory, optional
+      run times of previous requests. Defaults to a new `RuntimeHistory()`.
+  aging : float, optional
+      seconds of expected run time compensated by each second of waiting
+  default_runtime : float, optional
+      expected run time of workflows without history in seconds
+  """
+  def __init__(self, history=None, aging=0.1, default_runtime=60.):
+    self.history = history if history is not None else RuntimeHistory()
+    self.aging = aging
+    self.default_runtime = default_runtime
+
+  @staticmethod
+  def waiting_time(document, now=None):
+    """Seconds since a request document was last modified.
+    """
+    if now is None: now = time.time()
+    timestamp = document.get('lastModified') or document.get('created')
+    try: submitted = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+      return 0.
+    return max(now - submitted, 0.)
+
+  def expected_runtime(self, wf):
+    """Expected run time of a workflow in seconds.
+    """
+    return self.history.estimate(wf.name, wf.input_size(), self.default_runtime)
+
+  def priority(self, wf, now=None):
+    """Priority of a workflow. Lower values are run first.
+    """
+    return self.expected_runtime(wf) - self.aging*self.waiting_time(wf.document, now)
+
+  def order(self, workflows):
+    """Sort workflows in the order they should be run.
+
+    Parameters
+    ----------
+    workflows : list<Workflow>
+        workflows to be executed
+
+    Returns
+    -------
+    workflows : list<Workflow>
+        sorted workflows
+    """
+    now = time.time()
+    return sorted(workflows, key=lambda wf: self.priority(wf, now))
+
+  def record(self, wf, seconds):
+    """Add the run time of a successful workflow to the history.
+    """
+    self.history.record(wf.name, wf.input_size(), seconds)
+
+
+
+class WorkflowExecutor:
+  """Pool of prewarmed worker processes executing `Workflow` objects.
+
+  Parameters
+  ----------
+  processes : int, optional
+      number of worker processes. Defaults to the number of CPUs.
+  timeout : float, optional
+      default maximum run time of a workflow in seconds.
+      Overridden by a workflow's `resources['timeout']`.
+  memory : int, optional
+      default maximum memory of a workflow in bytes.
+      Overridden by a workflow's `resources['memory']`.
+  preload : list<str>, optional
+      modules imported once in every worker process before any workflow runs.
+  context : str, optional
+      multiprocessing start method ('fork', 'spawn' or 'forkserver').
+  scheduler : Scheduler, optional
+      if given, workflows are started in the order of their priority and 
+      their run times are recorded in the scheduler's history.
+      Otherwise, they are started in the given order.
+  memory_total : int, optional
+      memory in bytes available to all workflows together. Workflows are 
+      only started if their `resources['memory']` fits into the memory not 
+      reserved by running workflows.
+  """
+  def __init__(self, processes=None, timeout=None, memory=None, preload=PRELOAD, context=None,
+               scheduler=None, memory_total=None):
+    self.processes = processes or os.cpu_count() or 1
+    self.timeout = timeout
+    self.memory = memory
+    self.scheduler = scheduler
+    self.memory_total = memory_total
+    self.preload = tuple(preload)
+    self._context = multiprocessing.get_context(context)
+    self._workers = []
+    for _ in range(self.processes):
+      self._workers.append(self._spawn())
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.shutdown()
+
+  def _spawn(self):
+    conn, child_conn = self._context.Pipe()
+    process = self._context.Process(target=_worker, args=(child_conn, self.preload, self.memory), daemon=True)
+    process.start()
+    child_conn.close()
+    return {'process': process, 'conn': conn, 'key': None, 'started': 0.}
+
+  def _replace(self, worker):
+    """Kill a (possibly hanging) worker process and start a fresh one in its place.
+    """
+    worker['process'].terminate()
+    worker['process'].join(5)
+    if worker['process'].is_alive(): worker['process'].kill()
+    worker['conn'].close()
+    self._workers[self._workers.index(worker)] = self._spawn()
+
+  def _fail(self, wf, msg):
+    """Report a workflow that could not finish in its worker process as failed.
+    """
+    wf.init_members()
+    wf.code = ERROR_CODE['FAILED_WORKFLOW']
+    wf.traceback = msg
+    try:
+      os.makedirs(wf.directory, exist_ok=True)
+      wf.update_document()
+    except:
+      wf.traceback += traceback.format_exc()
+      print(wf.traceback)
+
+  def _timeout(self, wf):
+    timeout = wf.resources.get('timeout')
+    if timeout is None: timeout = self.timeout
+    return timeout
+
+  def _needs(self, wf):
+    """CPUs and memory reserved by a workflow, limited to the executor's capacity.
+    """
+    cpus = min(wf.resources.get('cpus') or 1, self.processes)
+    memory = 0
+    if self.memory_total is not None:
+      memory = min(wf.resources.get('memory') or self.memory or 0, self.memory_total)
+    return cpus, memory
+
+  def _next(self, pending, workflows, skips):
+    """Choose the next workflow that fits into the free CPUs and memory.
+
+    Workflows further down the order may overtake one that does not fit, 
+    unless it has already been overtaken `MAX_SKIPS` times.
+    """
+    busy = [workflows[worker['key']] for worker in self._workers if worker['key'] is not None]
+    free_cpus = self.processes - sum(self._needs(wf)[0] for wf in busy)
+    free_memory = (self.memory_total or 0) - sum(self._needs(wf)[1] for wf in busy)
+
+    order = pending
+    if self.scheduler is not None:
+      now = time.time()
+      order = sorted(pending, key=lambda key: self.scheduler.priority(workflows[key], now))
+
+    for key in order:
+      cpus, memory = self._needs(workflows[key])
+      if cpus <= free_cpus and memory <= free_memory:
+        if key != order[0]: skips[order[0]] = skips.get(order[0], 0) + 1
+        return key
+      if skips.get(order[0], 0) >= MAX_SKIPS: return None
+    return None
+
+  def _dispatch(self, worker, key, wf):
+    """Send a workflow to a free worker process.
+
+    Returns
+    -------
+    error : str or None
+        traceback if the workflow could not be sent, e.g. because it cannot
+        be pickled
+    """
+    try: worker['conn'].send(wf)
+    except:
+      # a workflow is pickled completely before it is written to the pipe
+      if not worker['process'].is_alive(): self._replace(worker)
+      return traceback.format_exc()
+    worker['key'] = key
+    worker['started'] = time.time()
+    return None
+
+  def _collect(self, worker, wf):
+    try: wf.code, wf.info, wf.traceback, wf.output_files, unfinished = worker['conn'].recv()
+    except EOFError:
+      return False
+    worker['key'] = None
+    if unfinished: 
+      self._fail(wf, wf.traceback)
+      return True
+    if self.scheduler is not None and not wf.code:
+      self.scheduler.record(wf, time.time() - worker['started'])
+    return True
+
+  def run(self, workflows):
+    """Execute workflows in the worker processes and wait for all of them to finish.
+
+    Parameters
+    ----------
+    workflows : list<Workflow>
+        workflows to be executed
+
+    Returns
+    -------
+    codes : list<int>
+        error codes of the workflows (see `workflow.ERROR_CODE`)
+    """
+    workflows = list(workflows)
+    pending = list(range(len(workflows)))
+    skips = dict()
+    done = 0
+    while done < len(workflows):
+      for worker in self._workers:
+        if worker['key'] is not None or not pending: continue
+        key = self._next(pending, workflows, skips)
+        if key is None: break
+        pending.remove(key)
+        error = self._dispatch(worker, key, workflows[key])
+        if error is not None:
+          self._fail(workflows[key], error)
+          done += 1
+
+      busy = [worker for worker in self._workers if worker['key'] is not None]
+      handles = [worker['conn'] for worker in busy] + [worker['process'].sentinel for worker in busy]
+      ready = wait(handles, timeout=POLL_INTERVAL)
+
+      for worker in busy:
+        key = worker['key']
+        wf = workflows[key]
+        if worker['conn'] in ready and self._collect(worker, wf):
+          done += 1
+          continue
+
+        timeout = self._timeout(wf)
+        if not worker['process'].is_alive():
+          msg = f"Worker process running '{wf.name}' died with exit code {worker['process'].exitcode}.\n"
+        elif timeout is not None and time.time() - worker['started'] > timeout:
+          msg = f"TimeoutError: Workflow '{wf.name}' exceeded its time limit of {timeout} s.\n"
+        else:
+          continue
+
+        self._replace(worker)
+        self._fail(wf, msg)
+        done += 1
+
+    return [wf.code for wf in workflows]
+
+  def shutdown(self):
+    """Stop all worker processes.
+    """
+    for worker in self._workers:
+      try: worker['conn'].send(None)
+      except (OSError, ValueError): pass
+    for worker in self._workers:
+      worker['process'].join(5)
+      if worker['process'].is_alive(): worker['process'].terminate()
+      worker['conn'].close()
+    self._workers = []
+
+
+
+class JobQueue:
+  """Queue of request documents in an SQLite file shared by several runners.
+
+  A runner leases a request for `ttl` seconds and has to renew the lease with
+  `heartbeat` while it is working on it. Leases that are not renewed expire,
+  after which the request can be leased by another runner.
+
+  Parameters
+  ----------
+  path : str
+      path of the SQLite database file (on a file system shared by all runners)
+  ttl : float, optional
+      lifetime of a lease in seconds
+  max_attempts : int, optional
+      number of times a request is leased before it is considered failed
+  owner : str, optional
+      name identifying this runner. Defaults to `<hostname>:<pid>`.
+  """
+  def __init__(self, path, ttl=600, max_attempts=3, owner=None):
+    self.path = path
+    self.ttl = ttl
+    self.max_attempts = max_attempts
+    self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    with self._connect() as db:
+      db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+        globalId TEXT PRIMARY KEY, workflow TEXT, state TEXT, owner TEXT,
+        lease_until REAL, attempts INTEGER, code INTEGER, updated REAL, lastModified TEXT)""")
+
+  def _connect(self):
+    db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    return db
+
+  def add(self, documents, workflow_class):
+    """Add pending requests for a workflow to the queue.
+
+    Requests that are already queued are left untouched, unless they have been
+    finished before, the request document was modified since and they have 
+    been attempted less than `max_attempts` times. Their attempts are kept.
+
+    Parameters
+    ----------
+    documents : list<dict>
+        RSpace request documents
+    workflow_class : type
+        subclass of `Workflow`, whose field names are used to read the requests
+
+    Returns
+    -------
+    added : list<str>
+        globalIds of the newly queued requests
+    """
+    added = []
+    with self._connect() as db:
+      db.execute('BEGIN IMMEDIATE')
+      for document in documents:
+        wf = workflow_class(document)
+        wf.init_members()
+        wf.check_completed()
+        if wf.code: continue
+        wf.check_workflow()
+        if wf.code: continue
+
+        row = db.execute('SELECT state, attempts, lastModified FROM jobs WHERE globalId=?', 
+          (document['globalId'],)).fetchone()
+        if row is None:
+          db.execute("""INSERT OR IGNORE INTO jobs (globalId, workflow, state, owner, lease_until, attempts, 
+            code, updated, lastModified) VALUES (?, ?, 'pending', NULL, 0, 0, NULL, ?, ?)""",
+            (document['globalId'], wf.name, time.time(), document.get('lastModified')))
+        elif row['state'] in ('done', 'failed') and row['lastModified'] != document.get('lastModified') \
+          and row['attempts'] < self.max_attempts:
+          db.execute("""UPDATE jobs SET state='pending', owner=NULL, lease_until=0, code=NULL, updated=?, 
+            lastModified=? WHERE globalId=?""", (time.time(), document.get('lastModified'), document['globalId']))
+        else:
+          continue
+        added.append(document['globalId'])
+      db.execute('COMMIT')
+    return added
+
+  def lease(self, workflow=None):
+    """Lease the next pending request.
+
+    Parameters
+    ----------
+    workflow : str, optional
+        only lease requests for the workflow with this name
+
+    Returns
+    -------
+    globalId : str or None
+        globalId of the leased request document, or None if nothing is pending.
+    """
+    now = time.time()
+    with self._connect() as db:
+      db.execute('BEGIN IMMEDIATE')
+      db.execute("UPDATE jobs SET state='failed', updated=? WHERE state='leased' AND lease_until<? AND attempts>=?",
+        (now, now, self.max_attempts))
+      query = "SELECT globalId FROM jobs WHERE (state='pending' OR (state='leased' AND lease_until<?))"
+      args = [now]
+      if workflow is not None:
+        query += ' AND workflow=?'
+        args.append(workflow)
+      row = db.execute(query+' ORDER BY updated LIMIT 1', args).fetchone()
+      if row is not None:
+        db.execute("UPDATE jobs SET state='leased', owner=?, lease_until=?, attempts=attempts+1, updated=? WHERE globalId=?",
+          (self.owner, now+self.ttl, now, row['globalId']))
+      db.execute('COMMIT')
+    if row is None: return None
+    return row['globalId']
+
+  def heartbeat(self, job):
+    """Renew the lease of a request.
+
+    Returns
+    -------
+    owned : bool
+        False if the lease has been lost to another runner in the meantime.
+    """
+    now = time.time()
+    with self._connect() as db:
+      cursor = db.execute("UPDATE jobs SET lease_until=?, updated=? WHERE globalId=? AND owner=? AND state='leased'",
+        (now+self.ttl, now, job, self.owner))
+    return cursor.rowcount > 0
+
+  def complete(self, job, code=0):
+    """Mark a leased request as finished with the given error code.
+    """
+    with self._connect() as db:
+      db.execute("UPDATE jobs SET state='done', code=?, updated=? WHERE globalId=? AND owner=?",
+        (code, time.time(), job, self.owner))
+
+  def release(self, job, retry=True, code=None):
+    """Give a leased request back to the queue after a failure.
+
+    Parameters
+    ----------
+    job : str
+        globalId of the request
+    retry : bool, optional
+        if `True`, the request is leased again later, as long as it has not
+        been attempted `max_attempts` times. Otherwise, it is marked as failed.
+    code : int, optional
+        error code of the failed attempt
+    """
+    with self._connect() as db:
+      db.execute("""UPDATE jobs SET owner=NULL, lease_until=0, code=?, updated=?,
+        state=CASE WHEN ? AND attempts<? THEN 'pending' ELSE 'failed' END
+        WHERE globalId=? AND owner=?""", (code, time.time(), retry, self.max_attempts, job, self.owner))
+
+  def status(self):
+    """Count the queued requests in each state.
+
+    Returns
+    -------
+    counts : dict
+        number of requests per state ('pending', 'leased', 'done', 'failed')
+    """
+    with self._connect() as db:
+      rows = db.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+
+def run_queue(queue, workflow_class, path=HOME, limit=None, scratch=None, clients=None):
+  """Lease requests for a workflow from a `JobQueue` and run them until the
+  queue is empty.
+
+  Requests failing with 'FAILED_DOWNLOAD' or 'FAILED_UPLOAD' are released for
+  another attempt, all other results are final.
+
+  Parameters
+  ----------
+  queue : JobQueue
+      queue shared with the other runners
+  workflow_class : type
+      subclass of `Workflow` to be executed
+  path : str, optional
+      parent directory of the workflow working directories
+  limit : int, optional
+      maximum number of requests to process
+  scratch : workflow.ScratchSpace, optional
+      scratch space managing the working directories instead of `path`
+  clients : core.ClientPool, optional
+      pool of clients, from which each request is handled by the client of
+      its owner. By default, `core.ELN` is used.
+
+  Returns
+  -------
+  codes : dict
+      error codes of the processed requests by globalId
+  """
+  codes = dict()
+  name = workflow_class.__name__
+  while limit is None or len(codes) < limit:
+    job = queue.lease(name)
+    if job is None: break
+
+    stop = threading.Event()
+    def heartbeat():
+      while not stop.wait(queue.ttl/3):
+        if not queue.heartbeat(job):
+          print(f"WARNING: lease on {job} lost to another runner.")
+          return
+    thread = threading.Thread(target=heartbeat, daemon=True)
+    thread.start()
+
+    try:
+      document = (clients.get() if clients is not None else core.ELN).get_document(job)
+      client = clients.for_document(document) if clients is not None else None
+      wf = workflow_class(document, path, scratch=scratch, client=client)
+      # the request may have been completed since it was queued
+      wf.init_members()
+      wf.check_completed()
+      if not wf.code: wf.run()
+    except:
+      print(traceback.format_exc())
+      queue.release(job, retry=True)
+      codes[job] = None
+      continue
+    finally:
+      stop.set()
+      thread.join()
+
+    if wf.code in RETRY_CODES: queue.release(job, retry=True, code=wf.code)
+    else: queue.complete(job, wf.code)
+    codes[job] = wf.code
+
+  return codes
+
+
+
+def run_pipelined(workflows, prefetch=2, uploads=2):
+  """Run workflows one after another, while the input files of the following
+  workflows are downloaded and the results of the previous ones are uploaded
+  in background threads.
+
+  Parameters
+  ----------
+  workflows : list<Workflow>
+      workflows to be executed
+  prefetch : int, optional
+      maximum number of workflows whose input files are downloaded ahead of
+      the currently computing one
+  uploads : int, optional
+      maximum number of finished workflows waiting for their upload
+
+  Returns
+  -------
+  codes : list<int>
+      error codes of the workflows (see `workflow.ERROR_CODE`)
+  """
+  workflows = list(workflows)
+  prepared = queue.Queue(maxsize=prefetch)
+  finished = queue.Queue(maxsize=uploads)
+  stop = threading.Event()
+
+  def download():
+    for wf in workflows:
+      if stop.is_set(): break
+      try: wf.prepare()
+      except:
+        wf.traceback += traceback.format_exc()
+        wf.code = ERROR_CODE['FAILED_DOWNLOAD']
+      prepared.put(wf)
+    prepared.put(None)
+
+  def upload():
+    while True:
+      wf = finished.get()
+      if wf is None: break
+      try: wf.update_document()
+      except:
+        wf.traceback += traceback.format_exc()
+        wf.code = ERROR_CODE['FAILED_UPLOAD']
+        print(wf.traceback)
+
+  threads = [threading.Thread(target=download, daemon=True), threading.Thread(target=upload, daemon=True)]
+  for thread in threads: thread.start()
+
+  try:
+    while True:
+      wf = prepared.get()
+      if wf is None: break
+      try: wf.execute()
+      except:
+        wf.traceback += traceback.format_exc()
+        wf.code = ERROR_CODE['FAILED_WORKFLOW']
+      finished.put(wf)
+  finally:
+    # stop the downloads, e.g. after a KeyboardInterrupt, but upload finished workflows
+    stop.set()
+    while threads[0].is_alive():
+      try: prepared.get(timeout=POLL_INTERVAL)
+      except queue.Empty: pass
+    finished.put(None)
+    for thread in threads: thread.join()
+  return [wf.code for wf in workflows]
+
+
+
+def run_batch(workflow_class, documents, path=HOME, batch_size=None, scratch=None, clients=None):
+  """Run a workflow in batch mode on all pending requests for it.
+
+  Documents that are already completed or request a different workflow are
+  skipped without being updated. The remaining requests are processed in 
+  groups of `batch_size`: the requests of a group are prepared (i.e. their
+  input files are downloaded) and passed to `Workflow.workflow_batch`, after
+  which every request document is updated with its own results, before the 
+  next group is prepared. Thus, `batch_size` also limits the number of 
+  working directories in use at the same time.
+
+  Parameters
+  ----------
+  workflow_class : type
+      subclass of `Workflow` to be executed
+  documents : list<dict>
+      RSpace request documents, e.g. from `core.get_requests`
+  path : str, optional
+      parent directory of the workflow working directories
+  batch_size : int, optional
+      maximum number of requests processed together. By default, all 
+      pending requests form a single batch.
+  scratch : workflow.ScratchSpace, optional
+      scratch space managing the working directories instead of `path`
+  clients : core.ClientPool, optional
+      pool of clients, from which each request is handled by the client of
+      its owner. By default, `core.ELN` is used.
+
+  Returns
+  -------
+  codes : dict
+      error codes of the processed requests by globalId
+  """
+  pending = []
+  for document in documents:
+    client = clients.for_document(document) if clients is not None else None
+    wf = workflow_class(document, path, scratch=scratch, client=client)
+    wf.init_members()
+    wf.check_completed()
+    if not wf.code: wf.check_workflow()
+    if wf.code in (ERROR_CODE['ALREADY_COMPLETED'], ERROR_CODE['WRONG_WORKFLOW']): continue
+    pending.append(wf)
+
+  codes = dict()
+  size = batch_size or len(pending) or 1
+  for start in range(0, len(pending), size):
+    batch = pending[start:start+size]
+    for wf in batch:
+      try: wf.prepare()
+      except:
+        wf.traceback += traceback.format_exc()
+        wf.code = ERROR_CODE['FAILED_DOWNLOAD']
+
+    items = [wf for wf in batch if not wf.code]
+    if items:
+      try: items[0].workflow_batch(items)
+      except:
+        msg = traceback.format_exc()
+        for item in items:
+          if item.code: continue
+          item.code = ERROR_CODE['FAILED_WORKFLOW']
+          item.traceback += msg
+
+    # releases the working directories of the batch in a scratch space
+    for wf in batch:
+      try: wf.update_document()
+      except:
+        wf.traceback += traceback.format_exc()
+        wf.code = ERROR_CODE['FAILED_UPLOAD']
+        print(wf.traceback)
+      codes[wf.document['globalId']] = wf.code
+  return codes
+
+
+
+
+def fetch_documents(ids=None, folder_id=None, max_workers=8, client=None):
+  """Fetch many request documents concurrently.
+
+  Parameters
+  ----------
+  ids : list, optional
+      ids or globalIds of documents. Documents given as dicts are used as they are.
+  folder_id : str, optional
+      folderID of an Rspace folder, all of whose documents (including those
+      in subfolders and notebooks) are fetched
+  max_workers : int, optional
+      maximum number of concurrent requests
+  client : core.ELNClass, optional
+      client used for the requests. Defaults to `core.ELN`.
+
+  Returns
+  -------
+  documents : list<dict>
+      the fetched documents
+  """
+  if client is None: client = core.ELN
+  documents = [doc for doc in ids or [] if isinstance(doc, dict)]
+  fetch = [doc for doc in ids or [] if not isinstance(doc, dict)]
+  def walk(folder):
+    for record in core.iter_folder_tree(folder, client=client):
+      if record['type'] in ('FOLDER', 'NOTEBOOK'): walk(record['id'])
+      elif record['type'] == 'DOCUMENT': fetch.append(record['id'])
+  if folder_id is not None: walk(folder_id)
+
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    documents += list(pool.map(client.get_document, fetch))
+  return documents
+
+def _bulk_update(action, workflow_class, ids, folder_id, max_workers, client):
+  documents = fetch_documents(ids, folder_id, max_workers=max_workers, client=client)
+
+  def update(document):
+    wf = workflow_class(document, client=client)
+    wf.init_members()
+    wf.check_workflow()
+    if wf.code: return 'skipped'
+    try: return 'updated' if getattr(wf, action)() else 'skipped'
+    except: return traceback.format_exc()
+
+  result = {'updated': [], 'skipped': [], 'failed': dict()}
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    for document, outcome in zip(documents, pool.map(update, documents)):
+      if outcome in ('updated', 'skipped'): result[outcome].append(document['globalId'])
+      else: result['failed'][document['globalId']] = outcome
+  return result
+
+def reset_requests(workflow_class, ids=None, folder_id=None, max_workers=8, client=None):
+  """Reset many requests for a workflow concurrently (see `Workflow.reset_document`),
+  e.g. to run them again after a bug fix.
+
+  Documents requesting another workflow and documents that are already reset
+  are skipped without being updated.
+
+  Parameters
+  ----------
+  workflow_class : type
+      subclass of `Workflow`, whose field names are used
+  ids, folder_id, max_workers, client
+      documents and requests (see `fetch_documents`)
+
+  Returns
+  -------
+  result : dict
+      globalIds of 'updated' and 'skipped' documents, and tracebacks of
+      'failed' updates by globalId
+  """
+  return _bulk_update('reset_document', workflow_class, ids, folder_id, max_workers, client)
+
+def complete_requests(workflow_class, ids=None, folder_id=None, max_workers=8, client=None):
+  """Mark many requests for a workflow as completed concurrently (see
+  `Workflow.complete_document`), e.g. to cancel them.
+
+  Documents requesting another workflow and documents that are already
+  completed are skipped without being updated.
+
+  Returns
+  -------
+  result : dict
+      see `reset_requests`
+  """
+  return _bulk_update('complete_document', workflow_class, ids, folder_id, max_workers, client)
+
+def request_status(document, workflow_class=Workflow):
+  """Status of a request document.
+
+  Parameters
+  ----------
+  document : dict
+      RSpace request document
+  workflow_class : type, optional
+      subclass of `Workflow`, whose field names are used
+
+  Returns
+  -------
+  workflow : str or None
+      requested workflow, or None if the document has no workflow field
+  status : str
+      'PENDING' if the request has not been processed, otherwise the name of 
+      its error code in `ERROR_CODE` as reported in the output field, 
+      'SUCCESS' for completed requests without error code and 'WRONG_FORM' 
+      for documents lacking the fields of the workflow.
+  """
+  wf = workflow_class(document)
+  field = core.get_field(document, wf.field_name['workflow']) if wf.field_name['workflow'] is not None else {}
+  workflow = field.get('content')
+  completed = core.get_field(document, wf.field_name['completed'])
+  output = core.get_field(document, wf.field_name['output'])
+  if not completed or not output: return workflow, 'WRONG_FORM'
+
+  # runs on already completed requests append their message to the output
+  codes = [int(code) for code in re.findall(r'Exit with the error code (\d+)', output.get('content') or '')]
+  codes = [code for code in codes if code in ERROR_NAME and code != ERROR_CODE['ALREADY_COMPLETED']]
+  if codes: return workflow, ERROR_NAME[codes[-1]]
+  if completed.get('content') == 'yes': return workflow, 'SUCCESS'
+  return workflow, 'PENDING'
+
+def status_report(ids=None, folder_id=None, workflow_class=Workflow, max_workers=8, client=None):
+  """Number of requests per workflow and status.
+
+  Parameters
+  ----------
+  ids, folder_id, max_workers, client
+      documents and requests (see `fetch_documents`)
+  workflow_class : type, optional
+      subclass of `Workflow`, whose field names are used
+
+  Returns
+  -------
+  report : dict
+      dicts of the number of requests by status (see `request_status`) by 
+      requested workflow
+  """
+  report = dict()
+  for document in fetch_documents(ids, folder_id, max_workers=max_workers, client=client):
+    workflow, status = request_status(document, workflow_class)
+    counts = report.setdefault(workflow, dict())
+    counts[status] = counts.get(status, 0) + 1
+  return report
@@ -27,11 +27,20 @@ The code for this example can be found `here <https://github.com/sintharic/inm-r
 """
 
 import os, sys
+import json
+import mmap
+import time
 import shutil
+import socket
+import pickle
+import hashlib
+import zipfile
 import traceback
+import threading
 from pathlib import Path
 from datetime import datetime
 from fnmatch import fnmatch
+import numpy as np
 from . import core
 
 
@@ -50,23 +59,231 @@ ERROR_CODE = {
   "FAILED_WORKFLOW": 8
 }
 ERROR_NAME = {v: k for k, v in ERROR_CODE.items()}
+# requests that are not executed by this workflow
+SKIP_CODES = (ERROR_CODE['ALREADY_COMPLETED'], ERROR_CODE['WRONG_FORM'], ERROR_CODE['WRONG_WORKFLOW'])
+# the holder of a cache lock refreshes its modification time every
+# CACHE_LOCK_HEARTBEAT seconds, locks older than CACHE_LOCK_TIMEOUT are stale
+CACHE_LOCK_HEARTBEAT = 30
+CACHE_LOCK_TIMEOUT = 300
 
 
 
-def get_file_paths(field):
-  """Not yet working!
+def file_checksum(filepath, chunk_size=2**20):
+  """SHA-256 checksum of a file's content.
+  
+  Parameters
+  ----------
+  filepath : str
+      path of the file
+  chunk_size : int, optional
+      number of bytes read at once
+  
+  Returns
+  -------
+  checksum : str
+      hexadecimal SHA-256 digest
   """
+  digest = hashlib.sha256()
+  with open(filepath, 'rb') as fid:
+    for chunk in iter(lambda: fid.read(chunk_size), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+
+def get_file_paths(field, directory='.', client=None):
+  """Local paths of the gallery files attached to or linked in a document 
+  field, as they are named by `Workflow.download_files` in `directory`.
   
-  files = []
-  lines = field['content'].split('\n')
-  xml = core.parse_xml(field['content'])
-  paragraphs = xml.getElementsByTagName('p')
-  paragraphs = [str(p) for p in paragraphs]
-  for paragraph in paragraphs:
-    print(paragraph)
-    if os.path.isfile(paragraph): files.append(paragraph)
+  Parameters
+  ----------
+  field : dict
+      document field containing the keys 'content' and 'files'
+  directory : str, optional
+      directory the files are (or will be) downloaded to
+  client : core.ELNClass, optional
+      client used to look up the names of files that are only linked in the 
+      field content. Defaults to `core.ELN`.
+  
+  Returns
+  -------
+  files : list<str>
+      file paths in the order of the attachments followed by linked files
+  """
+  files = {file['globalId']: file['name'] for file in field.get('files') or []}
+  content = field.get('content') if isinstance(field.get('content'), str) else ''
+  for global_id in core.linked_ids(content):
+    if global_id.startswith('GL') and global_id not in files:
+      files[global_id] = core.get_object(global_id, client=client)['name']
+  return [f"{directory}{os.sep}{name}" for name in files.values()]
+
+
 
-  return files
+def directory_size(directory):
+  """Total size in bytes of all files in a directory tree.
+  """
+  size = 0
+  for root, dirs, files in os.walk(directory):
+    for file in files:
+      try: size += os.path.getsize(os.path.join(root, file))
+      except OSError: pass
+  return size
+
+
+class ScratchSpace:
+  """Manager of the working directories of workflows below a common root,
+  e.g. on a fast local disk, with a total size quota.
+
+  Each working directory records whether its run is still in progress,
+  completed or failed. When the quota is exceeded, the directories of
+  completed runs are deleted first, least recently used first, then those
+  of failed runs older than `max_age` and finally result cache entries,
+  least recently used first. Younger failed runs are kept, so that a re-run
+  can resume from their checkpoints.
+
+  Parameters
+  ----------
+  root : str, optional
+      dedicated parent directory of the workflow working directories. Only
+      directories created by a `ScratchSpace` are counted and evicted.
+  quota : int, optional
+      maximum total size in bytes of all working directories and result
+      caches below `root`. If None, nothing is evicted.
+  cleanup : bool, optional
+      if `True`, the working directory of a run is deleted as soon as its
+      results were uploaded successfully.
+  max_age : float, optional
+      age in seconds after which the working directory of a failed run may
+      be evicted
+
+  Pass it to a workflow as `Workflow(document, scratch=scratch)`, which then
+  uses `root` instead of `path` as parent directory.
+  """
+  MARKER = '.scratch.json'
+
+  def __init__(self, root=f"{HOME}{os.sep}.inm_rspace_scratch", quota=None, cleanup=False, max_age=7*24*3600):
+    self.root = root
+    self.quota = quota
+    self.cleanup = cleanup
+    self.max_age = max_age
+
+  def _mark(self, directory, state):
+    with open(f"{directory}{os.sep}{self.MARKER}", 'w') as fid:
+      json.dump({'state': state, 'time': time.time()}, fid)
+
+  def _workflows(self):
+    if not os.path.isdir(self.root): return []
+    return [workflow for workflow in os.scandir(self.root) if workflow.is_dir()]
+
+  def runs(self):
+    """All working directories below the root that were created by a 
+    `ScratchSpace`.
+
+    Returns
+    -------
+    runs : list<dict>
+        dicts with the keys 'workflow', 'directory', 'state' ('running',
+        'completed' or 'failed'), 'time' (of the last state change) and 
+        'size' (in bytes)
+    """
+    runs = []
+    for workflow in self._workflows():
+      for run in os.scandir(workflow.path):
+        if not run.is_dir() or run.name == '.cache': continue
+        try:
+          with open(f"{run.path}{os.sep}{self.MARKER}") as fid: marker = json.load(fid)
+        except (OSError, ValueError):
+          continue
+        runs.append({'workflow': workflow.name, 'directory': run.path, 'state': marker['state'],
+                     'time': marker['time'], 'size': directory_size(run.path)})
+    return runs
+
+  def cache_entries(self):
+    """All result cache entries below the root (see `Workflow.execute`).
+
+    Returns
+    -------
+    entries : list<dict>
+        dicts with the keys 'workflow', 'directory', 'time' (of the last use)
+        and 'size' (in bytes)
+    """
+    entries = []
+    for workflow in self._workflows():
+      cache = f"{workflow.path}{os.sep}.cache"
+      if not os.path.isdir(cache): continue
+      for entry in os.scandir(cache):
+        if not entry.is_dir() or entry.name.endswith('.tmp'): continue
+        entries.append({'workflow': workflow.name, 'directory': entry.path, 
+                        'time': entry.stat().st_mtime, 'size': directory_size(entry.path)})
+    return entries
+
+  def usage(self):
+    """Disk usage per workflow.
+
+    Returns
+    -------
+    usage : dict
+        dicts with the number of working directories ('runs'), their total
+        size ('size') and the size of the result cache ('cache') in bytes
+        by workflow name
+    """
+    usage = dict()
+    for run in self.runs():
+      entry = usage.setdefault(run['workflow'], {'runs': 0, 'size': 0, 'cache': 0})
+      entry['runs'] += 1
+      entry['size'] += run['size']
+    for entry in self.cache_entries():
+      usage.setdefault(entry['workflow'], {'runs': 0, 'size': 0, 'cache': 0})['cache'] += entry['size']
+    return usage
+
+  def evict(self, required=0):
+    """Delete the working directories of completed runs, then those of failed
+    runs older than `self.max_age` and then result cache entries, each least 
+    recently used first, until the total size plus `required` bytes fits into 
+    the quota.
+
+    Returns
+    -------
+    freed : int
+        number of bytes freed
+    """
+    if self.quota is None: return 0
+    runs, entries = self.runs(), self.cache_entries()
+    total = sum(run['size'] for run in runs) + sum(entry['size'] for entry in entries)
+    by_time = lambda item: item['time']
+    candidates = sorted([run for run in runs if run['state'] == 'completed'], key=by_time)
+    candidates += sorted([run for run in runs if run['state'] == 'failed' 
+                          and time.time() - run['time'] > self.max_age], key=by_time)
+    # cache entries that are being computed are locked
+    candidates += sorted([entry for entry in entries if not os.path.exists(f"{entry['directory']}.lock")], key=by_time)
+    freed = 0
+    for candidate in candidates:
+      if total - freed + required <= self.quota: break
+      shutil.rmtree(candidate['directory'], ignore_errors=True)
+      freed += candidate['size']
+    if total - freed + required > self.quota:
+      print(f"WARNING: scratch space {self.root} exceeds its quota of {self.quota} bytes.")
+    return freed
+
+  def acquire(self, directory, required=0):
+    """Mark the working directory of a run as in progress and make room for
+    `required` bytes (e.g. the size of its input files).
+    """
+    self.evict(required)
+    os.makedirs(directory, exist_ok=True)
+    self._mark(directory, 'running')
+
+  def release(self, directory, success):
+    """Mark the working directory of a run as completed or failed, and delete
+    it if the run was successful and `self.cleanup` is set. Otherwise, other
+    runs are evicted if the quota is exceeded.
+    """
+    if not os.path.isdir(directory): return
+    if success and self.cleanup:
+      shutil.rmtree(directory, ignore_errors=True)
+      return
+    self._mark(directory, 'completed' if success else 'failed')
+    self.evict()
 
 
 class Workflow:
@@ -78,17 +295,29 @@ class Workflow:
 - in that class, redefine functions `define(self)` and `workflow(self, ...)`.
   (see documentation of those functions below and `this example workflow 
   <https://github.com/sintharic/inm-rspace/blob/main/examples/workflow_PlotColumnsCSV.py>`_.
+
+  All requests to RSpace are made with `self.eln`, which is `core.ELN` unless
+  another client is passed as `client`, e.g. from a `core.ClientPool`.
   """
-  def __init__(self, document: dict, path=HOME):
+  def __init__(self, document: dict, path=HOME, scratch=None, client=None):
     self.name = str(self.__class__.mro()[0]).split('.')[-1][:-2]
     self.document = document
+    self.eln = client if client is not None else core.ELN
+    self.scratch = scratch
+    if scratch is not None: path = scratch.root
+    self.snapshot = core.field_snapshot(document)
     self.directory = f"{path}{os.sep}{self.name}{os.sep}{self.document['globalId']}_{self.document['name']}"
+    self.cache_directory = f"{path}{os.sep}{self.name}{os.sep}.cache"
+    self.checkpoint_directory = f"{self.directory}{os.sep}.checkpoints"
     self.time_signature = ''
 
     self.expected = dict()
     self.field_name = {'input': 'Unknown', 'output': 'Unknown', 'workflow': 'Unknown', 'kwargs': 'Unknown', 'completed': 'Unknown'}
 
     self.description = ''
+    self.resources = {'timeout': None, 'memory': None, 'cpus': 1}
+    self.version = None
+    self.stages = []
     self._ready = False
     
     self.define()
@@ -121,6 +350,33 @@ class Workflow:
   content of this field.
   Otherwise, it will always execute if all the necessary fields are present.
   This option lets you create RSpace Forms eligible for more than one workflow.
+- `self.resources['timeout']`: maximum run time in seconds and
+  `self.resources['memory']`: maximum memory in bytes of the workflow when it
+  is executed by a `runner.WorkflowExecutor`. Exceeding either makes the
+  request fail with error code 'FAILED_WORKFLOW'. 
+  `self.resources['cpus']`: number of CPU cores used by the workflow. 
+  A `runner.WorkflowExecutor` only starts as many workflows at once as fit 
+  into its cores and memory.
+- `self.version`: a version string of the workflow. If set, the output files
+  of successful runs are cached in `self.cache_directory` and reused for 
+  requests with identical input files and kwargs instead of running the 
+  workflow again. Change it whenever you change the results of the workflow.
+- `self.expected['archive']`: a dict of archive file names and lists of 
+  glob-style patterns (e.g. `{'frames.zip': ['frame_*.png']}`). Output files 
+  matching these patterns are packed into a single compressed archive, which 
+  is uploaded instead of the individual files. All other output files are 
+  still uploaded individually.
+- `self.expected['layout']`: binary layout of input files as a dict of 
+  glob-style patterns and dicts with the keys 'dtype', 'shape' and 'offset'
+  (header size in bytes), which is used by `self.input_array` to map input 
+  files into memory. Redefine `self.parse_header` for file formats that 
+  describe their own layout.
+- `self.stages`: names of the stages of a long-running workflow in the order 
+  they are executed. Wrap each stage in `self.workflow` in a call to 
+  `self.stage(name, fun, ...)` to save its result as a checkpoint, so that a 
+  re-run after a crash skips the stages that were already completed. 
+  Checkpoints are deleted once the results of a run have been uploaded 
+  successfully.
     """
     self.field_name['completed'] = 'Completed'
 
@@ -150,6 +406,8 @@ class Workflow:
     self.kwargs = dict()
     self.input_files = []
     self.output_files = []
+    self.checksums = dict()
+    self.state = {'key': None, 'inputs': dict(), 'stages': dict()}
 
   def prepare(self):
     """Prepare for workflow execution: 
@@ -165,13 +423,16 @@ class Workflow:
     self.check_completed()
     if self.code: return
     
-    os.makedirs(self.directory, exist_ok=True)
-
     self.check_workflow()
     if self.code: return
+
+    if self.scratch is not None: self.scratch.acquire(self.directory, self.input_size())
+    os.makedirs(self.directory, exist_ok=True)
+    self.state = self.load_state()
     
     self.get_args()
     self.get_input_files()
+    if not self.code: self.check_checkpoints()
 
     self._ready = True
   
@@ -249,6 +510,13 @@ class Workflow:
       self.traceback += traceback.format_exc()
 
 
+  def input_size(self):
+    """Total size in bytes of the files attached to the input field of the 
+    request document (before downloading them).
+    """
+    files = core.get_files(self.document, self.field_name['input'])
+    return sum(file.get('size') or 0 for file in files)
+
   def get_input_files(self):
     """Check if all expected input files have been provided in the request. 
     If yes, download them.
@@ -277,12 +545,263 @@ class Workflow:
     """
     for file in files:
       filepath = f"{self.directory}{os.sep}{file['name']}"
-      try: core.ELN.download_file(file['id'], filepath)
+      if self.verify_input(file, filepath):
+        self.input_files.append(filepath)
+        continue
+      try: self.eln.download_file(file['id'], filepath)
       except: 
         self.traceback += traceback.format_exc()
         self.code = ERROR_CODE['FAILED_DOWNLOAD']
         return
       self.input_files.append(filepath)
+      self.checksums.pop(filepath, None)
+      self.state['inputs'][file['name']] = {'id': file['id'], 'version': file.get('version'), 'sha256': self.checksum(filepath)}
+      self.save_state()
+
+  def verify_input(self, file, filepath):
+    """Check if an input file has already been downloaded by a previous run 
+    and is still intact.
+    
+    Parameters
+    ----------
+    file : dict
+        Rspace file object
+    filepath : str
+        local path of the file
+
+    Returns
+    -------
+    verified : bool
+        True if the local file matches the recorded checksum of the same file.
+    """
+    record = self.state['inputs'].get(file['name'])
+    if record is None or not os.path.isfile(filepath): return False
+    if record['id'] != file['id'] or record['version'] != file.get('version'): return False
+    return self.checksum(filepath) == record['sha256']
+
+  def checksum(self, filepath):
+    """SHA-256 checksum of a file, computed only once per run.
+    """
+    if filepath not in self.checksums: 
+      self.checksums[filepath] = file_checksum(filepath)
+    return self.checksums[filepath]
+
+  def load_state(self):
+    """Load the checkpoint state saved by a previous run in the working directory.
+    
+    Returns
+    -------
+    state : dict
+        recorded input files and completed stages
+    """
+    try:
+      with open(f"{self.checkpoint_directory}{os.sep}state.json") as fid: 
+        return json.load(fid)
+    except (OSError, ValueError):
+      return {'key': None, 'inputs': dict(), 'stages': dict()}
+
+  def save_state(self):
+    """Save the checkpoint state in the working directory.
+    """
+    os.makedirs(self.checkpoint_directory, exist_ok=True)
+    filepath = f"{self.checkpoint_directory}{os.sep}state.json"
+    with open(filepath+'.tmp', 'w') as fid: json.dump(self.state, fid)
+    os.replace(filepath+'.tmp', filepath)
+
+  def check_checkpoints(self):
+    """Discard the checkpoints of a previous run if the input files or kwargs
+    have changed since.
+    """
+    key = self.cache_key()
+    if self.state['key'] == key: return
+    for name in list(self.state['stages'].keys()):
+      self.discard_stage(name)
+    self.state['key'] = key
+    self.save_state()
+
+  def clear_checkpoints(self):
+    """Delete the checkpoints of all stages, e.g. after the results of a run
+    have been uploaded, so that a later run of the same request executes all
+    stages again.
+    """
+    # stages may have been recorded by another process (e.g. an executor worker)
+    self.state = self.load_state()
+    for name in list(self.state['stages'].keys()):
+      self.discard_stage(name)
+    if os.path.isdir(self.checkpoint_directory): self.save_state()
+
+  def discard_stage(self, name):
+    """Delete the checkpoint of a stage.
+    """
+    record = self.state['stages'].pop(name, None)
+    if record is None: return
+    try: os.remove(f"{self.checkpoint_directory}{os.sep}{record['file']}")
+    except FileNotFoundError: pass
+
+  def stage(self, name, fun, *args, **kwargs):
+    """Execute one stage of the workflow, or load its result if it has been 
+    completed by a previous run with the same input files and kwargs.
+
+    The result of `fun` is pickled into `self.checkpoint_directory`. When a 
+    stage is executed, the checkpoints of all stages following it in 
+    `self.stages` are discarded.
+    
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    fun : function
+        function executing the stage
+    *args, **kwargs
+        arguments passed to `fun`
+    
+    Returns
+    -------
+    result
+        return value of `fun`
+    """
+    record = self.state['stages'].get(name)
+    if record is not None:
+      try:
+        with open(f"{self.checkpoint_directory}{os.sep}{record['file']}", 'rb') as fid: 
+          result = pickle.load(fid)
+        self.info += f"Resumed stage '{name}' from checkpoint of {record['time_signature']}.\n"
+        return result
+      except:
+        self.discard_stage(name)
+
+    if name in self.stages:
+      for following in self.stages[self.stages.index(name)+1:]:
+        self.discard_stage(following)
+
+    result = fun(*args, **kwargs)
+
+    record = {'file': f"{name}.pkl", 'time_signature': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    os.makedirs(self.checkpoint_directory, exist_ok=True)
+    filepath = f"{self.checkpoint_directory}{os.sep}{record['file']}"
+    with open(filepath+'.tmp', 'wb') as fid: pickle.dump(result, fid)
+    os.replace(filepath+'.tmp', filepath)
+    self.state['stages'][name] = record
+    self.save_state()
+    return result
+
+  def input_path(self, file):
+    """Local path of an input file.
+    
+    Parameters
+    ----------
+    file : int or str
+        index in `self.input_files`, file name or path
+    
+    Returns
+    -------
+    filepath : str
+        path of the downloaded input file
+    """
+    if isinstance(file, int): return self.input_files[file]
+    for filepath in self.input_files:
+      if file in (filepath, os.path.basename(filepath)): return filepath
+    raise FileNotFoundError(f"'{file}' is not an input file of workflow '{self.name}'")
+
+  def parse_header(self, filepath):
+    """Read the binary layout of an input file from its header.
+
+    Redefine this function for file formats with a header describing the 
+    data. By default, the layout is taken from `self.expected['layout']`.
+    
+    Parameters
+    ----------
+    filepath : str
+        path of the input file
+    
+    Returns
+    -------
+    layout : dict or None
+        dict with (some of) the keys 'dtype', 'shape' and 'offset', 
+        or None if the file has no header.
+    """
+    return None
+
+  def input_layout(self, file):
+    """Binary layout of an input file from `self.parse_header` or 
+    `self.expected['layout']`.
+    """
+    filepath = self.input_path(file)
+    layout = {'dtype': np.uint8, 'shape': None, 'offset': 0}
+    for pattern, pattern_layout in self.expected.get('layout', dict()).items():
+      if fnmatch(os.path.basename(filepath), pattern):
+        layout.update(pattern_layout)
+        break
+    header = self.parse_header(filepath)
+    if header is not None: layout.update(header)
+    return layout
+
+  def input_buffer(self, file):
+    """Map an input file into memory without reading it.
+    
+    Parameters
+    ----------
+    file : int or str
+        index in `self.input_files`, file name or path
+    
+    Returns
+    -------
+    buffer : mmap.mmap
+        read-only memory map of the whole file
+    """
+    with open(self.input_path(file), 'rb') as fid:
+      return mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+
+  def input_array(self, file, dtype=None, shape=None, offset=None):
+    """Map a binary input file into memory as a numpy array without reading it.
+
+    Arguments that are not given are taken from `self.input_layout`.
+    
+    Parameters
+    ----------
+    file : int or str
+        index in `self.input_files`, file name or path
+    dtype : numpy.dtype, optional
+        data type of the array elements
+    shape : tuple<int>, optional
+        shape of the array. By default, a flat array of the whole file.
+    offset : int, optional
+        number of header bytes preceding the data
+    
+    Returns
+    -------
+    array : numpy.memmap
+        read-only array backed by the file
+    """
+    layout = self.input_layout(file)
+    if dtype is None: dtype = layout['dtype']
+    if shape is None: shape = layout['shape']
+    if offset is None: offset = layout['offset']
+    return np.memmap(self.input_path(file), dtype=dtype, mode='r', offset=offset, shape=shape)
+
+  def iter_chunks(self, file, chunk_size=2**26, **layout):
+    """Iterate over an input file in chunks along the first axis of its array, 
+    so that files larger than the memory can be processed.
+    
+    Parameters
+    ----------
+    file : int or str
+        index in `self.input_files`, file name or path
+    chunk_size : int, optional
+        approximate size of each chunk in bytes
+    **layout
+        'dtype', 'shape' and 'offset' passed to `self.input_array`
+    
+    Yields
+    ------
+    chunk : numpy.memmap
+        consecutive slices of the array
+    """
+    array = self.input_array(file, **layout)
+    row_size = array.itemsize*int(np.prod(array.shape[1:]))
+    rows = max(1, chunk_size//max(row_size, 1))
+    for start in range(0, array.shape[0], rows):
+      yield array[start:start+rows]
 
   def workflow(self, **kwargs):
     """The actual workflow to be executed.
@@ -297,6 +816,156 @@ class Workflow:
       fid.write('Dummy result of base Workflow class.')
     self.output_files.append(filepath)
 
+  def workflow_batch(self, items):
+    """Execute the workflow for several requests at once.
+
+    This function is called by `runner.run_batch` on the first of the 
+    prepared workflows in `items`. Redefine it to perform expensive setup 
+    (e.g. loading a model or calibration) only once and then process the inputs
+    of all items together. Append each item's results to its own 
+    `item.output_files` and set `item.code` and `item.traceback` of items 
+    that failed individually.
+
+    By default, every item is executed on its own.
+
+    Parameters
+    ----------
+    items : list<Workflow>
+        prepared workflows of the same class, one per request document
+    """
+    for item in items: item.execute()
+
+  def execute(self):
+    """Execute `self.workflow()` if the preparation was successful and record
+    any error raised by it.
+
+    If `self.version` is set, cached results of an identical request are 
+    reused instead. Identical requests executed at the same time wait for
+    the first one of them to finish and reuse its results.
+    """
+    if self.code: return
+    if self.version is None:
+      self._execute()
+      return
+
+    entry = f"{self.cache_directory}{os.sep}{self.cache_key()}"
+    lockfile = f"{entry}.lock"
+    os.makedirs(self.cache_directory, exist_ok=True)
+    while not self.load_cached(entry):
+      try: fd = os.open(lockfile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+      except FileExistsError:
+        if self._stale_lock(lockfile): 
+          try: os.remove(lockfile)
+          except FileNotFoundError: pass
+        else: time.sleep(1)
+        continue
+
+      stop = threading.Event()
+      def heartbeat():
+        while not stop.wait(CACHE_LOCK_HEARTBEAT):
+          try: os.utime(lockfile)
+          except OSError: pass
+      thread = threading.Thread(target=heartbeat, daemon=True)
+      try:
+        os.write(fd, f"{socket.gethostname()}:{os.getpid()}".encode())
+        os.close(fd)
+        thread.start()
+        self._execute()
+        if not self.code: self.store_cached(entry)
+      finally:
+        stop.set()
+        if thread.is_alive(): thread.join()
+        os.remove(lockfile)
+      return
+
+  def _execute(self):
+    try: self.workflow()
+    except:
+      self.code = ERROR_CODE['FAILED_WORKFLOW']
+      self.traceback += traceback.format_exc()
+
+  @staticmethod
+  def _stale_lock(lockfile):
+    """Check if the process holding a cache lock file is gone, or has not
+    refreshed the lock for `CACHE_LOCK_TIMEOUT` seconds (e.g. on another host).
+    """
+    try:
+      if time.time() - os.path.getmtime(lockfile) > CACHE_LOCK_TIMEOUT: return True
+      with open(lockfile) as fid: host, pid = fid.read().split(':')
+    except (OSError, ValueError):
+      return False
+    if host != socket.gethostname(): return False
+    try: os.kill(int(pid), 0)
+    except ProcessLookupError: return True
+    except (PermissionError, ValueError): pass
+    return False
+
+  def cache_key(self):
+    """Key identifying the results of this workflow for its current input files
+    and kwargs.
+    
+    Returns
+    -------
+    key : str
+        hexadecimal SHA-256 digest of the workflow name and version, the kwargs 
+        and the names and checksums of the input files.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{self.name}\n{self.version}\n".encode())
+    digest.update(json.dumps(self.kwargs, sort_keys=True, default=str).encode())
+    for filepath in sorted(self.input_files, key=os.path.basename):
+      digest.update(f"\n{os.path.basename(filepath)}:{self.checksum(filepath)}".encode())
+    return digest.hexdigest()
+
+  def load_cached(self, entry):
+    """Copy cached output files into the working directory.
+    
+    Parameters
+    ----------
+    entry : str
+        directory of the cache entry
+    
+    Returns
+    -------
+    found : bool
+        True if the cache entry exists and its files were copied.
+    """
+    try:
+      with open(f"{entry}{os.sep}manifest.json") as fid: manifest = json.load(fid)
+    except (OSError, ValueError):
+      return False
+
+    # mark the entry as recently used for the eviction from a scratch space
+    try: os.utime(entry)
+    except OSError: pass
+    for filename in manifest['files']:
+      filepath = f"{self.directory}{os.sep}{filename}"
+      shutil.copy2(f"{entry}{os.sep}{filename}", filepath)
+      self.output_files.append(filepath)
+    self.info += f"Reused results of {manifest['globalId']} from {manifest['time_signature']} with identical input files and arguments.\n"
+    return True
+
+  def store_cached(self, entry):
+    """Save the output files of a successful run as a cache entry.
+    
+    Parameters
+    ----------
+    entry : str
+        directory of the cache entry
+    """
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    files = []
+    for filepath in self.output_files:
+      filename = os.path.basename(filepath)
+      shutil.copy2(filepath, f"{tmp}{os.sep}{filename}")
+      files.append(filename)
+    manifest = {'globalId': self.document['globalId'], 'time_signature': self.time_signature, 'files': files}
+    with open(f"{tmp}{os.sep}manifest.json", 'w') as fid: json.dump(manifest, fid)
+    try: os.rename(tmp, entry)
+    except OSError: shutil.rmtree(tmp, ignore_errors=True)
+
   def summary(self):
     """Summarize the success of the workflow based on generated error codes.
     """
@@ -340,9 +1009,33 @@ class Workflow:
 
     return msg
 
+  def pack_outputs(self):
+    """Replace the output files matching the patterns in 
+    `self.expected['archive']` by compressed zip archives.
+    """
+    remaining = list(self.output_files)
+    archives = []
+    for archive_name, patterns in self.expected.get('archive', dict()).items():
+      if isinstance(patterns, str): patterns = [patterns]
+      members = [file for file in remaining if any(fnmatch(os.path.basename(file), pattern) for pattern in patterns)]
+      if not members: continue
+
+      archive = f"{self.directory}{os.sep}{archive_name}"
+      with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for file in members: zf.write(file, arcname=os.path.basename(file))
+      remaining = [file for file in remaining if file not in members]
+      archives.append(archive)
+      self.info += f"Packed {len(members)} output files into {archive_name}.\n"
+
+    self.output_files = remaining + archives
+
   def update_document(self):
     """Update the request document with the results of the workflow.
     """
+    try: self.pack_outputs()
+    except:
+      self.traceback += traceback.format_exc()
+      self.code = ERROR_CODE['FAILED_UPLOAD']
 
     if self.traceback != '':
       filepath = f"{self.directory}{os.sep}error_traceback.txt"
@@ -354,7 +1047,7 @@ class Workflow:
     uploads = []
     for file in self.output_files:
       try: 
-        file_obj = core.ELN.upload_file(open(file, 'rb'))
+        file_obj = self.eln.upload_file(open(file, 'rb'))
         uploads.append(file_obj)
       except:
         self.traceback += traceback.format_exc()
@@ -382,10 +1075,20 @@ class Workflow:
     # update document
     # if self.code: return
     # print([f['name'] for f in fields])#DEBUG
-    core.ELN.update_document(self.document['id'], fields=fields)
+    self.commit_fields()
+    # the working directory of a skipped request belongs to an earlier run
+    if self.code in SKIP_CODES: return
+    # only crashed or failed runs resume from their checkpoints
+    if not self.code: self.clear_checkpoints()
+    if self.scratch is not None: self.scratch.release(self.directory, success=not self.code)
 
   def reset_document(self):
     """Reset the request document to an empty 'output' field and 'completed' field 'no'.
+
+    Returns
+    -------
+    updated : bool
+        False if the document was already reset.
     """
 
     fields = self.document['fields']
@@ -395,8 +1098,39 @@ class Workflow:
       elif fields[i]['name']==self.field_name['output']:
         fields[i]['content'] = ''
 
-    core.ELN.update_document(self.document['id'], fields=fields)
-    print(f"Reset Rspace document {self.document['id']}")
+    updated = self.commit_fields()
+    if updated: print(f"Reset Rspace document {self.document['id']}")
+    else: print(f"Rspace document {self.document['id']} already reset")
+    return updated
+
+  def complete_document(self):
+    """Mark the request document as completed ('completed' field 'yes') 
+    without running the workflow.
+    """
+    fields = self.document['fields']
+    for i in range(len(fields)):
+      if fields[i]['name']==self.field_name['completed']:
+        fields[i]['content'] = 'yes'
+
+    updated = self.commit_fields()
+    if updated: print(f"Marked Rspace document {self.document['id']} as completed")
+    else: print(f"Rspace document {self.document['id']} already completed")
+    return updated
+
+  def commit_fields(self):
+    """Send the fields of the request document that changed since the last 
+    update to RSpace. Nothing is sent if no field changed.
+
+    Returns
+    -------
+    updated : bool
+        True if the document was updated.
+    """
+    fields = core.changed_fields(self.document, self.snapshot)
+    if not fields: return False
+    self.eln.update_document(self.document['id'], fields=fields)
+    self.snapshot = core.field_snapshot(self.document)
+    return True
 
   def run(self):
     """Run the entire Workflow.
@@ -407,10 +1141,6 @@ class Workflow:
     """
 
     self.prepare()
-    if not self.code:
-      try: self.workflow()
-      except:
-        self.code = ERROR_CODE['FAILED_WORKFLOW']
-        self.traceback += traceback.format_exc()
+    self.execute()
     self.update_document()
     
\ No newline at end of file
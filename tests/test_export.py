@@ -0,0 +1,27 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pytest.importorskip('rspace_client')
+from inm_rspace import export
+
+
+FIELDS = [{'name': 'name', 'type': 'String'}, {'name': 'Amount', 'type': 'Number'}]
+
+def make_document(i):
+  return {'globalId': f'SD{i}', 'name': f'doc{i}', 'created': '2024-01-01', 'lastModified': '2024-01-02',
+          'fields': [{'name': 'name', 'content': f'sample{i}'}, {'name': 'Amount', 'content': str(i)}]}
+
+
+def test_form_schema_field_named_like_document_column():
+  schema = export.form_schema(FIELDS)
+  assert len(set(schema.names)) == len(schema.names)
+  assert '_name' in schema.names and 'name' in schema.names
+
+
+def test_iter_record_batches_field_named_like_document_column():
+  batches = list(export.iter_record_batches((make_document(i) for i in range(3)), FIELDS, batch_size=2))
+  table = pa.Table.from_batches(batches)
+  assert [batch.num_rows for batch in batches] == [2, 1]
+  assert table.column('_name').to_pylist() == ['doc0', 'doc1', 'doc2']
+  assert table.column('name').to_pylist() == ['sample0', 'sample1', 'sample2']
+  assert table.column('Amount').to_pylist() == [0., 1., 2.]